@@ -0,0 +1,63 @@
+"""Compare the scheduling of independent flows in one session
+and in a `ShardedSession`.
+
+The nodes run in the event loop (`job_type="local"`), so in one
+session the flows are limited by one loop and the GIL, the shards
+run them in separate processes.
+"""
+import time
+import asyncio
+from sunmao.api import compute, Flow
+from sunmao.core.shard import ShardedSession
+
+
+@compute
+def Burn(a: int) -> int:
+    s = 0
+    for i in range(a):
+        s += i
+    return s
+
+
+N_FLOWS = 8
+N_RUNS = 10
+WORK = 1_000_000
+
+
+def build(flow: Flow):
+    with flow:
+        Burn(name="burn", job_type="local")
+
+
+async def run_single():
+    flows = [Flow() for _ in range(N_FLOWS)]
+    for f in flows:
+        build(f)
+    t0 = time.time()
+    for _ in range(N_RUNS):
+        await asyncio.gather(*[f({"burn.a": WORK}) for f in flows])
+    return time.time() - t0
+
+
+async def run_sharded(n_shards: int):
+    with ShardedSession(n_shards=n_shards) as sharded:
+        flows = [sharded.new_flow() for _ in range(N_FLOWS)]
+        for f in flows:
+            build(f)
+        # send the flows to the shards before timing
+        await asyncio.gather(*[sharded.run(f, {"burn.a": 1}) for f in flows])
+        t0 = time.time()
+        for _ in range(N_RUNS):
+            await asyncio.gather(*[
+                sharded.run(f, {"burn.a": WORK}) for f in flows])
+        return time.time() - t0
+
+
+async def main():
+    print(f"single session: {await run_single():.2f}s")
+    for n in (1, 2, 4):
+        print(f"{n} shard(s): {await run_sharded(n):.2f}s")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -55,7 +55,12 @@ def get_install_requires():
 
 requires_test = [
     'pytest', 'pytest-cov', 'pytest-order',
-    'pytest-asyncio', 'flake8', 'mypy'
+    'pytest-asyncio', 'flake8', 'mypy',
+    'dask[distributed]', 'numpy',
+]
+
+requires_dask = [
+    'dask[distributed]',
 ]
 
 
@@ -76,6 +81,7 @@ setup(
     install_requires=get_install_requires(),
     extras_require={
         'dev': requires_test,
+        'dask': requires_dask,
     },
     python_requires='>=3.8, <4',
 )
@@ -1,6 +1,9 @@
 from ..core.node import ComputeNode
 from ..core.node_port import Port
+from ..core.array_port import ArrayPort
 from ..core.flow import Flow
+from ..core.subflow import FlowNode
+from ..core.map_node import Map
 from ..core.session import Session
 from .convert import compute
 from .patch import patch_all
@@ -10,5 +13,6 @@ patch_all()
 
 
 __all__ = [
-    "ComputeNode", "Port", "Session", "Flow", "compute",
+    "ComputeNode", "Port", "ArrayPort", "Session", "Flow", "FlowNode", "Map",
+    "compute",
 ]
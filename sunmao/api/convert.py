@@ -12,6 +12,13 @@ def compute(
         default_exec_mode: T.Literal['all', 'any'] = 'all',
         default_job_type: JOB_TYPES = 'thread',
         save_output_cache: bool = True,
+        default_coalesce: bool = False,
+        default_debounce: T.Optional[float] = None,
+        default_max_rate: T.Optional[float] = None,
+        default_timeout: T.Optional[float] = None,
+        default_retries: int = 0,
+        default_backoff: float = 0.0,
+        default_on_error: T.Literal['skip', 'default', 'fail_flow'] = 'skip',
         ) -> T.Type[ComputeNode]:
     """Decorator for create ComputeNode from a callable object."""
     if target_func is None:
@@ -20,6 +27,13 @@ def compute(
             default_exec_mode=default_exec_mode,
             default_job_type=default_job_type,
             save_output_cache=save_output_cache,
+            default_coalesce=default_coalesce,
+            default_debounce=default_debounce,
+            default_max_rate=default_max_rate,
+            default_timeout=default_timeout,
+            default_retries=default_retries,
+            default_backoff=default_backoff,
+            default_on_error=default_on_error,
         )  # type: ignore
     else:
         desc = parse_func(target_func)
@@ -29,6 +43,13 @@ def compute(
             bp.save_cache = save_output_cache
         _default_exec_mode = default_exec_mode
         _default_job_type = default_job_type
+        _default_coalesce = default_coalesce
+        _default_debounce = default_debounce
+        _default_max_rate = default_max_rate
+        _default_timeout = default_timeout
+        _default_retries = default_retries
+        _default_backoff = default_backoff
+        _default_on_error = default_on_error
 
         class Node(ComputeNode):
             __doc__ = target_func.__doc__
@@ -36,8 +57,17 @@ def compute(
             init_output_ports: T.List["Port"] = output_bps
             default_exec_mode = _default_exec_mode
             default_job_type = _default_job_type
+            default_coalesce = _default_coalesce
+            default_debounce = _default_debounce
+            default_max_rate = _default_max_rate
+            default_timeout = _default_timeout
+            default_retries = _default_retries
+            default_backoff = _default_backoff
+            default_on_error = _default_on_error
             func = staticmethod(target_func)  # type: ignore
             func_desc = desc
 
         Node.__name__ = target_func.__name__  # type: ignore
+        Node.__qualname__ = target_func.__qualname__  # type: ignore
+        Node.__module__ = target_func.__module__
         return Node
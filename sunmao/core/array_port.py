@@ -0,0 +1,174 @@
+import typing as T
+import sys
+
+from .node_port import Port, InputDataPort, OutputDataPort
+from .remote import RemoteRef
+
+if T.TYPE_CHECKING:
+    from funcdesc.desc import Value
+    from .node import Node
+
+
+def _is_ndarray(val: T.Any) -> bool:
+    # numpy is not imported if it's not used
+    np = sys.modules.get("numpy")
+    return (np is not None) and isinstance(val, np.ndarray)
+
+
+def _is_record_batch(val: T.Any) -> bool:
+    pa = sys.modules.get("pyarrow")
+    return (pa is not None) and isinstance(val, (pa.RecordBatch, pa.Table))
+
+
+class ArraySpec():
+    """Schema of the chunks passed through an array port.
+
+    The chunk is validated once as a whole(dtype, shape or schema),
+    instead of element by element.
+
+    Args:
+        dtype: The dtype of the NumPy array, anything accepted
+            by `numpy.dtype`. None for any dtype.
+        shape: The shape of the NumPy array, None in it means
+            any size on that dimension, None for any shape.
+        schema: The `pyarrow.Schema` of the Arrow record batches or tables.
+        columns: Columns(fields of the structured array, or
+            columns of the record batch) to select on the input port,
+            the node receives a zero-copy projection.
+    """
+    def __init__(
+            self,
+            dtype: T.Optional[T.Any] = None,
+            shape: T.Optional[T.Tuple[T.Optional[int], ...]] = None,
+            schema: T.Optional[T.Any] = None,
+            columns: T.Optional[T.List[str]] = None,
+            ) -> None:
+        self.dtype = dtype
+        self.shape = shape
+        self.schema = schema
+        self.columns = columns
+
+    def check(self, val: T.Any):
+        if (val is None) or isinstance(val, RemoteRef):
+            return
+        if _is_ndarray(val):
+            self._check_ndarray(val)
+        elif _is_record_batch(val):
+            self._check_record_batch(val)
+        else:
+            raise TypeError(
+                f"Value of type {type(val)} is not an array or record batch.")
+
+    def _check_ndarray(self, arr: T.Any):
+        if self.schema is not None:
+            raise TypeError("Expect an Arrow record batch, got an ndarray.")
+        if self.dtype is not None:
+            import numpy as np
+            if arr.dtype != np.dtype(self.dtype):
+                raise TypeError(
+                    f"Array dtype {arr.dtype} is not {np.dtype(self.dtype)}.")
+        if self.shape is not None:
+            ok = (len(arr.shape) == len(self.shape)) and all(
+                (s is None) or (s == a) for s, a in zip(self.shape, arr.shape))
+            if not ok:
+                raise ValueError(
+                    f"Array shape {arr.shape} does not match {self.shape}.")
+
+    def _check_record_batch(self, batch: T.Any):
+        if (self.dtype is not None) or (self.shape is not None):
+            raise TypeError("Expect an ndarray, got an Arrow record batch.")
+        if (self.schema is not None) and \
+                (not batch.schema.equals(self.schema)):
+            raise TypeError(
+                f"Schema {batch.schema} does not match {self.schema}.")
+
+    def freeze(self, val: T.Any) -> T.Any:
+        """Return a read-only view of the array, so the buffer can be
+        shared by all the successors safely. Arrow data is immutable."""
+        if _is_ndarray(val) and val.flags.writeable:
+            val = val.view()
+            val.flags.writeable = False
+        return val
+
+    def project(self, val: T.Any) -> T.Any:
+        """Select the columns without copying the buffers."""
+        if (self.columns is None) or (val is None):
+            return val
+        if _is_ndarray(val):
+            # multi-field index of structured array returns a view
+            return val[list(self.columns)]
+        if _is_record_batch(val):
+            return val.select(self.columns)
+        return val
+
+
+class InputArrayPort(InputDataPort):
+    def __init__(
+            self, name: str, node: "Node",
+            val_desc: T.Optional["Value"] = None,
+            spec: T.Optional[ArraySpec] = None) -> None:
+        super().__init__(name, node, val_desc)
+        self.spec = ArraySpec() if spec is None else spec
+
+    def check(self, val):
+        self.spec.check(val)
+
+    def get_data(self) -> T.Any:
+        return self.spec.project(super().get_data())
+
+    def fetch_missing(self) -> T.Optional[T.Any]:
+        return self.spec.project(super().fetch_missing())
+
+
+class OutputArrayPort(OutputDataPort):
+    def __init__(
+            self, name: str, node: "Node", save_cache: bool = True,
+            val_desc: T.Optional["Value"] = None,
+            spec: T.Optional[ArraySpec] = None) -> None:
+        super().__init__(name, node, save_cache, val_desc)
+        self.spec = ArraySpec() if spec is None else spec
+
+    def check(self, val):
+        self.spec.check(val)
+
+    async def push_signal(self, data=None):
+        await super().push_signal(self.spec.freeze(data))
+
+
+class ArrayPort(Port):
+    """The blueprint of a port which carries chunks of columnar data,
+    NumPy arrays or Arrow record batches.
+
+    The chunks are validated with an `ArraySpec` once per signal,
+    the output arrays are passed to the successors as read-only views,
+    the fan-out successors share the same buffer.
+
+    Args:
+        name (str): The name of the port.
+        dtype, shape, schema, columns: See `ArraySpec`.
+        **kwargs: Other arguments of `Port`.
+    """
+    def __init__(
+            self, name: str,
+            dtype: T.Optional[T.Any] = None,
+            shape: T.Optional[T.Tuple[T.Optional[int], ...]] = None,
+            schema: T.Optional[T.Any] = None,
+            columns: T.Optional[T.List[str]] = None,
+            **kwargs) -> None:
+        super().__init__(name, **kwargs)
+        self.spec = ArraySpec(dtype, shape, schema, columns)
+
+    def to_input_port(
+            self, node: "Node",
+            val_desc: T.Optional["Value"] = None) -> InputArrayPort:
+        if val_desc is None:
+            val_desc = self.to_val_desc()
+        return InputArrayPort(self.name, node, val_desc, self.spec)
+
+    def to_output_port(
+            self, node: "Node",
+            val_desc: T.Optional["Value"] = None) -> OutputArrayPort:
+        if val_desc is None:
+            val_desc = self.to_val_desc()
+        return OutputArrayPort(
+            self.name, node, self.save_cache, val_desc, self.spec)
@@ -8,13 +8,15 @@ if T.TYPE_CHECKING:
 
 
 class SunmaoObj(object):
-    def __init__(self):
-        self.id = str(uuid.uuid4())
+    def __init__(self, id: T.Optional[str] = None):
+        self.id = str(uuid.uuid4()) if id is None else id
 
 
 class FlowElement(SunmaoObj):
-    def __init__(self, flow: T.Optional["Flow"] = None):
-        super().__init__()
+    def __init__(
+            self, flow: T.Optional["Flow"] = None,
+            id: T.Optional[str] = None):
+        super().__init__(id=id)
         if flow is None:
             from .session import Session
             flow = Session.get_current().current_flow
@@ -0,0 +1,250 @@
+import typing as T
+import os
+import json
+import asyncio
+from pathlib import Path
+
+from .node import ComputeNode
+from .node_port import ActivateSignal, OutputDataPort, skip_signal_tags
+from .remote import RemoteRef
+from .serialize import (
+    flow_to_dict, flow_from_dict, _encode_obj, _decode_obj
+)
+from .utils import logger
+
+if T.TYPE_CHECKING:
+    from .flow import Flow
+    from .node import Node
+    from .session import Session
+
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+class _RemoteSkipped(Exception):
+    pass
+
+
+def _remote_refs(flow: "Flow") -> T.List[RemoteRef]:
+    """The RemoteRef objects in the state of the flow."""
+    refs = []
+    for node in flow.nodes.values():
+        for port in node.output_ports:
+            if isinstance(port, OutputDataPort):
+                refs.append(port.cache)
+        for inp in node.input_ports:
+            refs.extend(sig.data for sig in inp.signal_buffer)
+        if isinstance(node, ComputeNode):
+            for args in node.inflight_args.values():
+                refs.extend(args)
+    return [r for r in refs if isinstance(r, RemoteRef)]
+
+
+async def fetch_remote_data(flow: "Flow") -> T.Dict[int, T.Any]:
+    """Fetch the data of the RemoteRef objects in the state of the flow,
+    for saving them in the checkpoint.
+
+    Returns:
+        The fetched data keyed by the id of the RemoteRef.
+    """
+    refs = _remote_refs(flow)
+    values = await asyncio.gather(*[ref.fetch() for ref in refs])
+    return {id(ref): val for ref, val in zip(refs, values)}
+
+
+def save_checkpoint(
+        flow: "Flow", directory: T.Union[str, Path],
+        remote_data: T.Optional[T.Dict[int, T.Any]] = None) -> Path:
+    """Save the state of a flow to a directory.
+
+    The checkpoint contains the flow structure, the caches of
+    output data ports, the pending signals in input ports and
+    the arguments of the running jobs. It is written to a temporary file
+    and then moved to the target, so the checkpoint file
+    is always in a consistent state.
+
+    The data kept on the dask workers(RemoteRef) can not be pickled,
+    it's replaced by the fetched data in `remote_data`,
+    see `fetch_remote_data`. The caches, signals and runs with
+    the data not fetched are skipped with a warning.
+
+    Args:
+        flow: The flow to save.
+        directory: The directory to store the checkpoint.
+        remote_data: Fetched data of the RemoteRef objects,
+            keyed by the id of the RemoteRef.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    fetched = remote_data or {}
+    n_skipped = 0
+
+    def local(val: T.Any) -> T.Any:
+        if isinstance(val, RemoteRef):
+            if id(val) not in fetched:
+                raise _RemoteSkipped()
+            return fetched[id(val)]
+        return val
+
+    data = flow_to_dict(flow)
+    node_index = {node.id: idx for idx, node in enumerate(flow.nodes.values())}
+    caches = []
+    signals = []
+    inflight = []
+    for idx, node in enumerate(flow.nodes.values()):
+        for p_idx, port in enumerate(node.output_ports):
+            if isinstance(port, OutputDataPort) and (port.cache is not None):
+                try:
+                    caches.append(
+                        [idx, p_idx, _encode_obj(local(port.cache))])
+                except _RemoteSkipped:
+                    n_skipped += 1
+        for p_idx, inp in enumerate(node.input_ports):
+            provider = inp.lastest_signal_provider
+            if (provider is not None) and (provider.node.id in node_index):
+                provider_key: T.Optional[T.List[int]] = [
+                    node_index[provider.node.id], provider.index]
+            else:
+                provider_key = None
+            if (len(inp.signal_buffer) == 0) and (provider_key is None):
+                continue
+            bufs = []
+            for sig in inp.signal_buffer:
+                try:
+                    bufs.append([sig.tag, _encode_obj(local(sig.data))])
+                except _RemoteSkipped:
+                    n_skipped += 1
+            signals.append([idx, p_idx, bufs, provider_key])
+        if isinstance(node, ComputeNode):
+            for args in node.inflight_args.values():
+                try:
+                    enc = _encode_obj(tuple(local(a) for a in args))
+                except _RemoteSkipped:
+                    n_skipped += 1
+                    continue
+                inflight.append([idx, enc])
+    if n_skipped > 0:
+        logger.warning(
+            f"Skipped {n_skipped} values kept on the dask workers "
+            f"in the checkpoint of {flow}, use `fetch_remote_data` "
+            "to include them.")
+    data["caches"] = caches
+    data["signals"] = signals
+    data["inflight"] = inflight
+    path = directory / CHECKPOINT_FILE
+    tmp_path = directory / (CHECKPOINT_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    logger.info(f"Saved checkpoint of {flow} to {path}")
+    return path
+
+
+def load_checkpoint(
+        directory: T.Union[str, Path],
+        session: T.Optional["Session"] = None,
+        node_classes: T.Optional[T.Dict[str, type]] = None,
+        ) -> "Flow":
+    """Load a flow from the checkpoint directory.
+    Call `Flow.resume` to continue the execution."""
+    path = Path(directory) / CHECKPOINT_FILE
+    with open(path) as f:
+        data = json.load(f)
+    flow = flow_from_dict(data, session=session, node_classes=node_classes)
+    nodes: T.List["Node"] = list(flow.nodes.values())
+    for idx, p_idx, bufs, provider_key in data["signals"]:
+        inp = nodes[idx].input_ports[p_idx]
+        for buf in bufs:
+            if isinstance(buf, list):
+                tag, enc = buf
+            else:  # saved without the tag
+                tag, enc = None, buf
+            if tag is not None:
+                skip_signal_tags(tag)
+            inp.signal_buffer.append(ActivateSignal(_decode_obj(enc), tag))
+        if provider_key is not None:
+            src, src_port = provider_key
+            inp.lastest_signal_provider = nodes[src].output_ports[src_port]
+    flow._resume_runs = [
+        (nodes[idx], _decode_obj(enc)) for idx, enc in data["inflight"]
+    ]
+    return flow
+
+
+async def resume(flow: "Flow"):
+    """Resume a flow loaded from checkpoint.
+
+    Runs that were in flight when the checkpoint was saved are
+    submitted again, and nodes with pending signals are activated.
+    Nodes already completed are not recomputed.
+    """
+    runs = flow._resume_runs
+    flow._resume_runs = []
+    for node, args in runs:
+        await node.run(*args)
+    for node in list(flow.nodes.values()):
+        if any(len(inp.signal_buffer) > 0 for inp in node.input_ports):
+            await node.activate()
+    await flow.join()
+
+
+class Checkpointer():
+    """Save checkpoints of a flow periodically.
+
+    Args:
+        flow: The flow to save.
+        directory: The directory to store the checkpoint.
+        interval: Time interval(seconds) between checkpoints.
+    """
+    def __init__(
+            self, flow: "Flow",
+            directory: T.Union[str, Path],
+            interval: float = 60.0) -> None:
+        self.flow = flow
+        self.directory = Path(directory)
+        self.interval = interval
+        self._task: T.Optional[asyncio.Task] = None
+
+    def save(self) -> Path:
+        return save_checkpoint(self.flow, self.directory)
+
+    async def save_async(self) -> Path:
+        """Save a checkpoint, with the data fetched from
+        the dask workers."""
+        remote_data = await fetch_remote_data(self.flow)
+        return save_checkpoint(self.flow, self.directory, remote_data)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save_async()
+            except Exception as e:
+                # keep saving, the next one may success
+                logger.error(
+                    f"Failed to save checkpoint of {self.flow}: {repr(e)}")
+
+    def start(self):
+        """Start saving checkpoints in background."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    def stop(self, save: bool = True):
+        """Stop saving checkpoints.
+
+        Args:
+            save: Whether to save a final checkpoint.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if save:
+            self.save()
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        self.stop(save=False)
+        await self.save_async()
@@ -1,13 +1,21 @@
 import typing as T
+import uuid
+import asyncio
+import contextlib
 from .base import SunmaoObj, FlowElement
+from .utils import gc_paused
 from .node import Node
 from .connection import Connection
 from .node_port import (
-    InputPort, OutputPort, InputDataPort, OutputDataPort
+    InputPort, OutputPort, InputDataPort, OutputDataPort,
+    new_signal_tag, current_signal_tag,
 )
 
 if T.TYPE_CHECKING:
+    from pathlib import Path
     from .session import Session
+    from .checkpoint import Checkpointer
+    from .record import SignalRecorder
     from executor.engine.manager import Jobs
 
 
@@ -25,6 +33,19 @@ class Flow(SunmaoObj):
         self.nodes: T.Dict[str, Node] = {}
         self.connections: T.Dict[str, Connection] = {}
         self.other_objs: T.Dict[str, FlowElement] = {}
+        # indexes of the nodes, keyed by name and by class
+        self._name_index: T.Dict[str, T.Dict[str, Node]] = {}
+        self._type_index: T.Dict[type, T.Dict[str, Node]] = {}
+        self._resume_runs: T.List[T.Tuple[Node, tuple]] = []
+        self.errors: T.List[T.Tuple[Node, Exception]] = []
+        # errors keyed by the run id of the signals, for `pipeline`
+        self._run_errors: T.Dict[
+            T.Optional[int], T.List[T.Tuple[Node, Exception]]] = {}
+        self._exception: T.Optional[Exception] = None
+        self.recorder: T.Optional["SignalRecorder"] = None
+        # nodes activated by the signals of each run id, the runs
+        # without a cone activate all the nodes
+        self._run_cones: T.Dict[int, T.Set[Node]] = {}
         if session is None:
             from .session import Session
             session = Session.get_current()
@@ -36,6 +57,8 @@ class Flow(SunmaoObj):
             return
         if isinstance(obj, Node):
             self.nodes[obj.id] = obj
+            self._type_index.setdefault(type(obj), {})[obj.id] = obj
+            self._update_name_index(obj, None)
         elif isinstance(obj, Connection):
             self.connections[obj.id] = obj
         else:
@@ -51,6 +74,9 @@ class Flow(SunmaoObj):
             return
         if isinstance(obj, Node):
             self.nodes.pop(obj.id)
+            self._pop_index(self._type_index, type(obj), obj)
+            if obj.name is not None:
+                self._pop_index(self._name_index, obj.name, obj)
             for conn in list(obj.connections):
                 self.remove_obj(conn)
         elif isinstance(obj, Connection):
@@ -61,6 +87,109 @@ class Flow(SunmaoObj):
             self.other_objs.pop(obj.id)
         self._obj_ids.remove(obj.id)
 
+    def add_nodes(self, cls: T.Type[Node], n: int, **attrs) -> T.List[Node]:
+        """Create `n` nodes of the class in the flow.
+
+        Args:
+            cls: The node class.
+            n: Number of nodes.
+            **attrs: Arguments for create the nodes.
+        """
+        with gc_paused():
+            return [cls(flow=self, **attrs) for _ in range(n)]
+
+    def connect_many(
+            self, edges: T.Any,
+            nodes: T.Optional[T.Sequence[Node]] = None,
+            ) -> T.List[Connection]:
+        """Connect the ports in bulk.
+
+        Args:
+            edges: Rows of `[src_node, src_port, dst_node, dst_port]`
+                indexes, can be a list or an (N, 4) integer array,
+                like a NumPy array.
+            nodes: The nodes which the node indexes refer to.
+                Defaults to the nodes of the flow, in insertion order.
+
+        Returns:
+            The created connections.
+
+        Raises:
+            ValueError: If an index is negative.
+        """
+        if hasattr(edges, "tolist"):
+            # convert array to list, avoid the overhead of numpy scalars
+            edges = edges.tolist()
+        if nodes is None:
+            nodes = list(self.nodes.values())
+        else:
+            for node in nodes:
+                if node.flow is not self:
+                    raise ValueError(f"{node} is not in {self}.")
+        # ids of the connections share a random prefix,
+        # cheaper than generating an uuid for each one
+        prefix = str(uuid.uuid4())
+        conns = []
+        with gc_paused():
+            for i, (src, src_port, dst, dst_port) in enumerate(edges):
+                if min(src, src_port, dst, dst_port) < 0:
+                    raise ValueError(
+                        f"Negative index in the edge {i}: "
+                        f"{[src, src_port, dst, dst_port]}")
+                out_port = nodes[src].output_ports[src_port]
+                in_port = nodes[dst].input_ports[dst_port]
+                conn = Connection(
+                    out_port, in_port, flow=self, id=f"{prefix}-{i}")
+                out_port.connections.add(conn)
+                in_port.connections.add(conn)
+                conns.append(conn)
+        return conns
+
+    @staticmethod
+    def _pop_index(index: T.Dict[T.Any, T.Dict[str, Node]], key, node: Node):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(node.id, None)
+            if len(bucket) == 0:
+                del index[key]
+
+    def _update_name_index(self, node: Node, old_name: T.Optional[str]):
+        """Called when the node is added or renamed."""
+        if old_name is not None:
+            self._pop_index(self._name_index, old_name, node)
+        if node.name is not None:
+            self._name_index.setdefault(node.name, {})[node.id] = node
+
+    def get_node(self, name: str) -> Node:
+        """Get the node by name.
+
+        Raises:
+            KeyError: If no node has the name.
+            ValueError: If more than one node has the name.
+        """
+        bucket = self._name_index.get(name)
+        if not bucket:
+            raise KeyError(f"No node named {name} in {self}.")
+        if len(bucket) > 1:
+            raise ValueError(f"More than one node named {name} in {self}.")
+        return next(iter(bucket.values()))
+
+    def nodes_of_type(
+            self, cls: type, subclass: bool = True) -> T.List[Node]:
+        """Get the nodes of the class.
+
+        Args:
+            cls: The node class.
+            subclass: Whether to include the nodes of the subclasses.
+        """
+        if not subclass:
+            return list(self._type_index.get(cls, {}).values())
+        nodes: T.List[Node] = []
+        for node_cls, bucket in self._type_index.items():
+            if issubclass(node_cls, cls):
+                nodes.extend(bucket.values())
+        return nodes
+
     @property
     def free_input_ports(self) -> T.List["InputPort"]:
         ports = []
@@ -76,22 +205,47 @@ class Flow(SunmaoObj):
         return ports
 
     def __enter__(self):
+        from .session import _push_current
         self._prev_flow = self.session._env_flow
         self.session.current_flow = self
+        # new nodes are created in the flow's session
+        _push_current(self.session)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        from .session import _pop_current
+        _pop_current()
         self.session.current_flow = self._prev_flow
 
-    def copy(self) -> "Flow":
-        """Copy the flow."""
+    def copy(self, session: T.Optional["Session"] = None) -> "Flow":
+        """Copy the flow.
+
+        Args:
+            session: Session of the new flow.
+                If not specified, will use the current session.
+        """
+        flow = Flow(session=session)
+        self.copy_into(flow)
+        return flow
+
+    def copy_into(
+            self, target: "Flow",
+            name_prefix: str = "") -> T.Dict[str, "Node"]:
+        """Copy the nodes and connections of the flow into another flow.
+
+        Args:
+            target: The target flow.
+            name_prefix: Prefix of the names of the new nodes.
+
+        Returns:
+            Map from the id of the old node to the new node.
+        """
         old_id2new_node: T.Dict[str, "Node"] = {}
-        flow = Flow()
         for node in list(self.nodes.values()):
-            new_node = node.copy()
-            new_node.flow = flow
+            new_node = node.copy(name=name_prefix + node.name)
+            new_node.flow = target
             old_id2new_node[node.id] = new_node
-            flow.add_obj(new_node)
+            target.add_obj(new_node)
         for conn in list(self.connections.values()):
             old_src_node_id = conn.source.node.id
             old_src_index = conn.source.index
@@ -102,7 +256,137 @@ class Flow(SunmaoObj):
             new_dst_node = old_id2new_node[old_dst_node_id]
             new_dst_port = new_dst_node.input_ports[old_dst_index]
             new_src_port.connect_with(new_dst_port)
-        return flow
+        return old_id2new_node
+
+    def inline_subflows(self):
+        """Inline the nodes of all the `FlowNode` in the flow,
+        so they are scheduled directly by this flow."""
+        from .subflow import FlowNode
+        for node in list(self.nodes.values()):
+            if isinstance(node, FlowNode):
+                node.inline()
+
+    def to_dict(self, with_caches: bool = False) -> dict:
+        """Convert the flow to a JSON serializable dict.
+        See `sunmao.core.serialize.flow_to_dict`."""
+        from .serialize import flow_to_dict
+        return flow_to_dict(self, with_caches=with_caches)
+
+    @classmethod
+    def from_dict(
+            cls, data: dict,
+            session: T.Optional["Session"] = None,
+            node_classes: T.Optional[T.Dict[str, type]] = None,
+            ) -> "Flow":
+        """Create a flow from the dict created by `Flow.to_dict`."""
+        from .serialize import flow_from_dict
+        return flow_from_dict(
+            data, session=session, node_classes=node_classes)
+
+    def dump(self, path: str, with_caches: bool = False):
+        """Dump the flow to a JSON file.
+
+        Args:
+            path: Path of the file.
+            with_caches: Whether to include the caches of output ports.
+        """
+        from .serialize import dump_flow
+        dump_flow(self, path, with_caches=with_caches)
+
+    @classmethod
+    def load(
+            cls, path: str,
+            session: T.Optional["Session"] = None,
+            node_classes: T.Optional[T.Dict[str, type]] = None,
+            ) -> "Flow":
+        """Load a flow from the JSON file created by `Flow.dump`.
+
+        Args:
+            path: Path of the file.
+            session: Session of the new flow.
+            node_classes: Map from import path to node class.
+        """
+        from .serialize import load_flow
+        return load_flow(path, session=session, node_classes=node_classes)
+
+    def save_checkpoint(self, directory: T.Union[str, "Path"]) -> "Path":
+        """Save the current state of the flow to a directory.
+        See `sunmao.core.checkpoint.save_checkpoint`."""
+        from .checkpoint import save_checkpoint
+        return save_checkpoint(self, directory)
+
+    @classmethod
+    def load_checkpoint(
+            cls, directory: T.Union[str, "Path"],
+            session: T.Optional["Session"] = None,
+            node_classes: T.Optional[T.Dict[str, type]] = None,
+            ) -> "Flow":
+        """Load a flow from the checkpoint directory,
+        call `Flow.resume` to continue the execution."""
+        from .checkpoint import load_checkpoint
+        return load_checkpoint(
+            directory, session=session, node_classes=node_classes)
+
+    async def resume(self):
+        """Resume the execution of a flow loaded from checkpoint."""
+        from .checkpoint import resume
+        await resume(self)
+
+    def checkpointer(
+            self, directory: T.Union[str, "Path"],
+            interval: float = 60.0) -> "Checkpointer":
+        """Create a checkpointer for save the flow periodically.
+
+        Args:
+            directory: The directory to store the checkpoint.
+            interval: Time interval(seconds) between checkpoints.
+        """
+        from .checkpoint import Checkpointer
+        return Checkpointer(self, directory, interval)
+
+    def record(
+            self, path: T.Union[str, "Path"],
+            sizes: bool = True,
+            payloads: bool = False,
+            sample: float = 1.0) -> "SignalRecorder":
+        """Record the signals of the flow to a file,
+        see `sunmao.core.record.SignalRecorder`.
+
+        Example:
+            with flow.record("signals.jsonl"):
+                await flow(inputs)
+        """
+        from .record import SignalRecorder
+        return SignalRecorder(
+            self, path, sizes=sizes, payloads=payloads, sample=sample)
+
+    def place(
+            self, workers: T.List[str],
+            weights: T.Union[None, str, "Path", dict] = None,
+            job_types: T.Collection[str] = ("process",),
+            ) -> T.Dict[Node, str]:
+        """Partition the flow and pin each partition's compute nodes to
+        a dask worker, minimize the data transferred between the workers.
+        See `sunmao.core.placement`.
+
+        Args:
+            workers: Addresses of the dask workers.
+            weights: Weights of the edges keyed by `(source, target)`
+                nodes, or the path of a signal record file, the
+                recorded payload sizes are used as the weights.
+                Defaults to 1 for each connection.
+            job_types: Job types of the nodes to pin,
+                the other nodes are left unchanged.
+
+        Returns:
+            Worker address of each pinned node.
+        """
+        from .placement import (
+            plan_placement, apply_placement, edge_weights_from_record)
+        if (weights is not None) and (not isinstance(weights, dict)):
+            weights = edge_weights_from_record(self, weights)
+        placement = plan_placement(self, len(workers), weights)
+        return apply_placement(placement, workers, job_types)
 
     async def join(
             self,
@@ -120,22 +404,298 @@ class Flow(SunmaoObj):
                         jobs_for_wait.append(job)
             return jobs_for_wait
 
-        await engine.wait_async(
-            timeout=timeout,
-            time_delta=time_delta,
-            select_jobs=select_func,
+        def has_pending_tasks() -> bool:
+            return any(
+                node.has_pending_tasks for node in self.nodes.values()
+            )
+
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        def remain() -> T.Optional[float]:
+            if deadline is None:
+                return None
+            return max(deadline - loop.time(), 0.0)
+
+        while True:
+            await engine.wait_async(
+                timeout=remain(),
+                time_delta=time_delta,
+                select_jobs=select_func,
+            )
+            # wait for the tasks not managed by the engine,
+            # like deferred activations(debounce, max_rate)
+            if (not has_pending_tasks()) or (remain() == 0.0):
+                break
+            await asyncio.sleep(time_delta)
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the flow has running jobs or deferred activations."""
+        return any(
+            node.is_busy or node.has_pending_tasks
+            for node in self.nodes.values()
         )
 
-    async def __call__(self, inputs: dict) -> dict:
+    async def cancel(self):
+        """Cancel the execution of the flow.
+        Cancel all running jobs, clear the signal buffers and
+        the deferred activations, the results of cancelled jobs
+        will not activate the downstream nodes."""
+        for node in list(self.nodes.values()):
+            await node.cancel()
+
+    async def fail(self, e: Exception):
+        """Mark the flow as failed and cancel it,
+        the exception will be raised from `Flow.__call__`."""
+        if self._exception is None:
+            self._exception = e
+        await self.cancel()
+
+    def get_output_port(self, key: str) -> OutputPort:
+        """Get output port by key in format of `node_name.port_name`."""
+        # both of the node name and port name may contain dots
+        pos = key.find(".")
+        while pos != -1:
+            bucket = self._name_index.get(key[:pos])
+            if bucket is not None:
+                port_name = key[pos+1:]
+                for node in bucket.values():
+                    idx = node.port_layout.output_index.get(port_name)
+                    if idx is not None:
+                        return node.output_ports[idx]
+            pos = key.find(".", pos + 1)
+        raise KeyError(f"No output port {key} in {self}.")
+
+    def validate(
+            self,
+            outputs: T.Optional[T.List[T.Union[str, OutputPort]]] = None,
+            prune: bool = False) -> T.List[Node]:
+        """Check the flow before execution, detect cycles,
+        the nodes can never be activated and type mismatches.
+        See `sunmao.core.validate.validate_flow`.
+
+        Args:
+            outputs: The output ports of interest, can be the port object
+                or the key in format of `node_name.port_name`.
+                Defaults to the free output data ports.
+            prune: Whether to remove the dead nodes,
+                which can not reach any of the outputs.
+
+        Returns:
+            The dead nodes.
+        """
+        from .validate import validate_flow
+        out_ports = None
+        if outputs is not None:
+            out_ports = self._resolve_outputs(outputs)
+        return validate_flow(self, out_ports, prune=prune)
+
+    def _resolve_outputs(
+            self,
+            outputs: T.Optional[T.List[T.Union[str, OutputPort]]],
+            ) -> T.List[OutputPort]:
+        """Get the output ports from the ports or keys,
+        defaults to the free output ports."""
+        if outputs is None:
+            return self.free_output_ports
+        return [
+            o if isinstance(o, OutputPort) else self.get_output_port(o)
+            for o in outputs
+        ]
+
+    @contextlib.contextmanager
+    def _watch_outputs(
+            self, out_ports: T.List[OutputPort],
+            func: T.Callable[[str, T.Any], None],
+            ) -> T.Iterator[T.List[str]]:
+        """Call `func(key, data)` when the output data ports push signals
+        in the context, yields the keys of the ports."""
+        keys = []
+        callbacks = []
+        for port in out_ports:
+            if not isinstance(port, OutputDataPort):
+                continue
+            key = f"{port.node.name}.{port.name}"
+            keys.append(key)
+
+            def callback(data, key=key):
+                func(key, data)
+
+            port.register_callback(callback)
+            callbacks.append((port, callback))
+        try:
+            yield keys
+        finally:
+            for port, callback in callbacks:
+                port.remove_callback(callback)
+
+    @staticmethod
+    def upstream_nodes(ports: T.Iterable[OutputPort]) -> T.Set[Node]:
+        """Return the nodes which the given output ports depend on,
+        including the nodes of the ports. Found by walking
+        the connections in reverse."""
+        visited: T.Set[Node] = set()
+        stack = [p.node for p in ports]
+        while stack:
+            node = stack.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            for inp in node.input_ports:
+                for pre in inp.predecessors:
+                    if pre.node not in visited:
+                        stack.append(pre.node)
+        return visited
+
+    async def __call__(
+            self, inputs: dict,
+            timeout: T.Optional[float] = None,
+            outputs: T.Optional[T.List[T.Union[str, OutputPort]]] = None,
+            validate: bool = False,
+            ) -> dict:
         """Intreface for execute the flow.
 
         Args:
             inputs: The input data for the flow.
                 It should be a dict, with the key is the name of the input
                 port, and the value is the data.
+            timeout: Timeout in seconds. If the flow is not finished
+                in time, it will be cancelled and raise `TimeoutError`.
+            outputs: The output ports to compute, can be the port object or
+                the key in format of `node_name.port_name`. If specified,
+                only the nodes which the outputs depend on will be executed,
+                and only the inputs of these nodes are required.
+                Defaults to all free output ports.
+            validate: Whether to check the flow with `Flow.validate`
+                before execution.
+
+        Returns:
+            The values pushed by the output data ports in this call,
+            the outputs not pushed(e.g. the branch is failed) are None.
+
+        Raises the exception of the failed node,
+        if it's `on_error` policy is "fail_flow".
+        """
+        if validate:
+            self.validate(outputs)
+        res = await self.pipeline([inputs], timeout=timeout, outputs=outputs)
+        return res[0]
+
+    async def stream(
+            self, inputs: dict,
+            timeout: T.Optional[float] = None,
+            outputs: T.Optional[T.List[T.Union[str, OutputPort]]] = None,
+            ) -> T.AsyncIterator[T.Tuple[str, T.Any]]:
+        """Execute the flow, yield `(port_key, value)` as soon as
+        an output data port pushes a signal, instead of
+        waiting for the whole flow. Arguments are same as `Flow.__call__`.
+        If the iteration is stopped early, the flow will be cancelled.
+
+        Example:
+            async for key, value in flow.stream(inputs):
+                ...
         """
-        free_input_nodes: T.Set[Node] = set()
+        from .remote import fetch_value
+        out_ports = self._resolve_outputs(outputs)
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        loop = asyncio.get_running_loop()
+        with self._watch_outputs(
+                out_ports, lambda key, data: queue.put_nowait((key, data))):
+            task = loop.create_task(
+                self(inputs, timeout=timeout, outputs=outputs))
+            task.add_done_callback(lambda _: queue.put_nowait(done))
+            try:
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    key, data = item
+                    yield key, await fetch_value(data)
+                task.result()
+            finally:
+                if not task.done():
+                    task.cancel()
+                    await self.cancel()
+
+    def add_error(self, node: Node, e: Exception):
+        """Record the error of the node, with the run id
+        of the signals which the node was running."""
+        self.errors.append((node, e))
+        self._run_errors.setdefault(
+            current_signal_tag(), []).append((node, e))
+
+    async def pipeline(
+            self, inputs: T.Iterable[dict],
+            timeout: T.Optional[float] = None,
+            outputs: T.Optional[T.List[T.Union[str, OutputPort]]] = None,
+            with_errors: bool = False,
+            ) -> T.List[T.Any]:
+        """Execute the flow with several inputs at the same time.
+
+        The inputs are fed without waiting the previous ones to finish,
+        the signals of each input are tagged with a run id, so the "all"
+        mode nodes only join the signals of the same input, in the
+        order of the inputs. Arguments are same as `Flow.__call__`,
+        except `inputs` is a sequence of the input dicts.
+
+        Args:
+            with_errors: If True, return `(outputs, errors)` of each input,
+                the errors are the `(node, exception)` of the runs
+                of the input.
+
+        Returns:
+            The outputs of each input, in the order of the inputs.
+        """
+        from .remote import fetch_value
+        out_ports = self._resolve_outputs(outputs)
+        active = None
+        if outputs is not None:
+            active = self.upstream_nodes(out_ports)
+        self.errors = []
+        self._run_errors = {}
+        self._exception = None
+        results: T.Dict[T.Optional[int], dict] = {}
+
+        def on_output(key: str, data: T.Any):
+            tag = current_signal_tag()
+            results.setdefault(tag, {})[key] = data
+
+        tags: T.List[int] = []
+        with self._watch_outputs(out_ports, on_output) as keys:
+            try:
+                inputs = list(inputs)
+                for inp in inputs:
+                    # check all before feeding any
+                    self._input_signals(inp, active)
+                for inp in inputs:
+                    tags.append(await self._feed(inp, active))
+                await self._wait(timeout)
+            finally:
+                for tag in tags:
+                    self._run_cones.pop(tag, None)
+        res: T.List[T.Any] = []
+        for tag in tags:
+            # outputs not pushed in the run are None
+            out = dict.fromkeys(keys)
+            out.update(results.get(tag, {}))
+            out = {k: await fetch_value(v) for k, v in out.items()}
+            if with_errors:
+                res.append((out, self._run_errors.get(tag, [])))
+            else:
+                res.append(out)
+        return res
+
+    def _input_signals(
+            self, inputs: dict,
+            active: T.Optional[T.Set[Node]] = None,
+            ) -> T.List[T.Tuple[InputPort, T.Any]]:
+        signals: T.List[T.Tuple[InputPort, T.Any]] = []
         for in_port in self.free_input_ports:
+            if (active is not None) and (in_port.node not in active):
+                continue
+            data = None
             if isinstance(in_port, InputDataPort):
                 node_name = in_port.node.name
                 if in_port.name in inputs:
@@ -146,16 +706,47 @@ class Flow(SunmaoObj):
                     raise ValueError(
                         f"Input port {in_port} is not provided."
                     )
-                in_port.put_signal(data=data)
-            else:
-                in_port.put_signal()
-            free_input_nodes.add(in_port.node)
+            signals.append((in_port, data))
+        return signals
+
+    def check_inputs(
+            self, inputs: dict,
+            outputs: T.Optional[T.List[T.Union[str, OutputPort]]] = None):
+        """Raise ValueError if an input port required for
+        the outputs is not provided. Arguments are same as
+        `Flow.__call__`."""
+        active = None
+        if outputs is not None:
+            active = self.upstream_nodes(self._resolve_outputs(outputs))
+        self._input_signals(inputs, active)
+
+    async def _feed(
+            self, inputs: dict,
+            active: T.Optional[T.Set[Node]] = None) -> int:
+        """Put the input signals tagged with a new run id,
+        and activate the nodes. Returns the run id.
+        If `active` is given, only these nodes are activated
+        by the signals of the run."""
+        signals = self._input_signals(inputs, active)
+        tag = new_signal_tag()
+        if active is not None:
+            self._run_cones[tag] = active
+        free_input_nodes: T.Dict[Node, None] = {}
+        for in_port, data in signals:
+            in_port.put_signal(data=data, tag=tag)
+            free_input_nodes[in_port.node] = None
         for node in free_input_nodes:
             await node.activate()
-        await self.join()
-        res = {}
-        for out_port in self.free_output_ports:
-            key = f"{out_port.node.name}.{out_port.name}"
-            if isinstance(out_port, OutputDataPort):
-                res[key] = out_port.cache
-        return res
+        return tag
+
+    async def _execute(self, inputs: dict, timeout: T.Optional[float]):
+        await self._feed(inputs)
+        await self._wait(timeout)
+
+    async def _wait(self, timeout: T.Optional[float]):
+        await self.join(timeout=timeout)
+        if (timeout is not None) and self.is_running:
+            await self.cancel()
+            raise TimeoutError(f"{self} timeout after {timeout}s.")
+        if self._exception is not None:
+            raise self._exception
@@ -0,0 +1,31 @@
+import inspect
+
+from executor.engine.job import Job, ThreadJob
+
+
+class AsyncJob(Job):
+    """Job that runs a coroutine function directly on the event loop,
+    without dispatching it to a thread or process."""
+
+    async def run(self):
+        res = self.func(*self.args, **self.kwargs)
+        if inspect.isawaitable(res):
+            res = await res
+        return res
+
+
+async def cancel_job(job: Job):
+    """Cancel a job without blocking the event loop.
+
+    `ThreadJob.cancel` waits for the running thread to finish,
+    here the job is marked as cancelled at once, the thread is left
+    to finish in background and it's result is dropped.
+    """
+    if job.status not in ("running", "pending"):
+        return
+    if isinstance(job, ThreadJob) and (job.status == "running"):
+        job.task.cancel()
+        job.status = "cancelled"
+        job.release_resource()
+    else:
+        await job.cancel()
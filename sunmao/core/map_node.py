@@ -0,0 +1,277 @@
+import typing as T
+import inspect
+import asyncio
+from itertools import islice
+from functools import partial
+
+from .node import Node, ComputeNode, JobType, _NodeRef
+from .node_port import Port, PortLayout
+from .serialize import get_class_path, import_class
+from .utils import job_type_classes, JOB_TYPES, logger, cancel_tasks
+from .profile import class_key
+
+if T.TYPE_CHECKING:
+    from executor.engine.job import Job
+
+
+# number of the chunk workers if neither the node nor the engine has limit
+_MAX_WORKERS = 64
+
+
+def _apply_chunk(func: T.Callable, chunk: T.List[tuple]) -> list:
+    return [func(*item) for item in chunk]
+
+
+async def _apply_chunk_async(func: T.Callable, chunk: T.List[tuple]) -> list:
+    return [await func(*item) for item in chunk]
+
+
+class Map(Node):
+    """Node that applies the `func` of a ComputeNode class over collections.
+
+    Each input port receives an iterable, the elements of the inputs
+    are zipped(like the builtin `map`) and split into chunks lazily,
+    at most `max_inflight` workers pull the chunks and submit them
+    as jobs. The results are gathered in order, each output port
+    gets a list.
+
+    Args:
+        node_cls (Type[ComputeNode] | str): The node class to apply,
+            or it's import path.
+        job_type (str, optional): Type of the chunk jobs.
+            If "auto", use the job type learned for `node_cls`.
+            Defaults to the `default_job_type` of `node_cls`.
+        chunk_size (int, optional): Number of elements in one job.
+            Defaults to the class attribute `default_chunk_size`.
+        max_inflight (int, optional): Max number of chunks running
+            at the same time, to cap the memory. None for the job limit
+            of the engine(`max_jobs` of the engine setting).
+            Defaults to the class attribute `default_max_inflight`.
+        retries (int, optional): Number of retries when a chunk job is
+            failed. Defaults to the `default_retries` of `node_cls`.
+        backoff (float, optional): Delay(seconds) before the first retry
+            of a chunk, doubled for each following retry.
+            Defaults to the `default_backoff` of `node_cls`.
+        on_error (str, optional): Policy when a chunk is failed and
+            no retries remain, see `Node`.
+            Defaults to the `default_on_error` of `node_cls`.
+        **kwargs: Other arguments of `Node`.
+    """
+
+    default_chunk_size: int = 1
+    default_max_inflight: T.Optional[int] = None
+    job_type = JobType()
+
+    def __init__(
+            self,
+            node_cls: T.Union[T.Type[ComputeNode], str],
+            exec_mode: str = Node.default_exec_mode,
+            name: T.Optional[str] = None,
+            job_type: T.Optional[JOB_TYPES] = None,
+            chunk_size: T.Optional[int] = None,
+            max_inflight: T.Optional[int] = None,
+            retries: T.Optional[int] = None,
+            backoff: T.Optional[float] = None,
+            on_error: T.Optional[str] = None,
+            **kwargs) -> None:
+        if isinstance(node_cls, str):
+            node_cls = import_class(node_cls)
+        self.node_cls = node_cls
+        self._tasks: T.Set[asyncio.Task] = set()
+        self._n_running = 0
+        self._chunk_futs: T.Dict[str, asyncio.Future] = {}
+        if on_error is None:
+            on_error = node_cls.default_on_error
+        super().__init__(
+            exec_mode=exec_mode, name=name, on_error=on_error, **kwargs)
+        if job_type is None:
+            job_type = node_cls.default_job_type
+        self.job_type = job_type  # type: ignore
+        self.chunk_size = self.default_chunk_size \
+            if chunk_size is None else chunk_size
+        if self.chunk_size < 1:
+            raise ValueError("chunk_size must be positive.")
+        self.max_inflight = self.default_max_inflight \
+            if max_inflight is None else max_inflight
+        self.retries = node_cls.default_retries \
+            if retries is None else retries
+        self.backoff = node_cls.default_backoff \
+            if backoff is None else backoff
+
+    def __repr__(self) -> str:
+        return (
+            f"<Map node_cls={self.node_cls.__name__} "
+            f"name={self.name}>"
+        )
+
+    def setup_ports(self):
+        inner = self.node_cls.get_port_layout()
+        self._apply_layout(PortLayout(
+            [Port(bp.name, exec=bp.exec) for bp in inner.input_bps],
+            [Port(bp.name, exec=bp.exec) for bp in inner.output_bps],
+        ))
+
+    def copy(self, name: T.Optional[str] = None) -> "Map":
+        kwargs = self.get_init_kwargs()
+        kwargs["node_cls"] = self.node_cls
+        if name is not None:
+            kwargs["name"] = name
+        return self.__class__(**kwargs)
+
+    def get_init_kwargs(self) -> T.Dict[str, T.Any]:
+        kwargs = super().get_init_kwargs()
+        kwargs["node_cls"] = get_class_path(self.node_cls)
+        kwargs["job_type"] = self.job_type
+        kwargs["chunk_size"] = self.chunk_size
+        kwargs["max_inflight"] = self.max_inflight
+        kwargs["retries"] = self.retries
+        kwargs["backoff"] = self.backoff
+        return kwargs
+
+    @property
+    def is_busy(self) -> bool:
+        return self._n_running > 0
+
+    @property
+    def has_pending_tasks(self) -> bool:
+        return super().has_pending_tasks or (len(self._tasks) > 0)
+
+    async def run(self, *args):
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(self._map(args, self._epoch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _n_workers(self) -> int:
+        if self.max_inflight:
+            return self.max_inflight
+        return self.session.engine.setting.max_jobs or _MAX_WORKERS
+
+    async def _map(self, args: tuple, epoch: int):
+        self._n_running += 1
+        try:
+            results, error = await self._map_chunks(args, epoch)
+        finally:
+            self._n_running -= 1
+        if self._epoch != epoch:
+            return
+        if error is not None:
+            await self.error_callback(error)
+            await self._on_job_finished()
+            return
+        outs = [r for idx in sorted(results) for r in results[idx]]
+        n_outputs = len(self.output_ports)
+        if n_outputs > 1:
+            cols = [list(col) for col in zip(*outs)] if outs \
+                else [[] for _ in range(n_outputs)]
+            await self.set_outputs(tuple(cols))
+        else:
+            await self.set_outputs(outs)
+        await self._on_job_finished()
+
+    async def _map_chunks(
+            self, args: tuple, epoch: int
+            ) -> T.Tuple[T.Dict[int, list], T.Optional[Exception]]:
+        """Run the chunks with the workers, the chunks are produced
+        only when a worker is free.
+
+        Returns:
+            The results of the chunks keyed by the chunk index,
+            and the first error.
+        """
+        items = zip(*args)
+        size = self.chunk_size
+        chunks = enumerate(iter(lambda: list(islice(items, size)), []))
+        results: T.Dict[int, list] = {}
+        failed: T.List[Exception] = []
+
+        async def worker():
+            for idx, chunk in chunks:
+                if failed or (self._epoch != epoch):
+                    return
+                try:
+                    results[idx] = await self._run_chunk(chunk)
+                except Exception as e:
+                    failed.append(e)
+                    return
+
+        await asyncio.gather(*[worker() for _ in range(self._n_workers())])
+        return results, (failed[0] if failed else None)
+
+    async def _run_chunk(self, chunk: T.List[tuple]) -> list:
+        """Submit the chunk and wait the result, retry if failed."""
+        attempt = 0
+        while True:
+            fut = await self._submit_chunk(chunk)
+            try:
+                return await fut
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(
+                    f"{self} chunk failed: {repr(e)}, retry after {delay}s.")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def _on_chunk_done(self, job_id: str, res: list):
+        fut = self._chunk_futs.pop(job_id, None)
+        if (fut is not None) and (not fut.done()):
+            fut.set_result(res)
+
+    def _on_chunk_failed(self, job_id: str, e: Exception):
+        fut = self._chunk_futs.pop(job_id, None)
+        if (fut is not None) and (not fut.done()):
+            fut.set_exception(e)
+
+    async def _submit_chunk(self, chunk: T.List[tuple]) -> asyncio.Future:
+        if self.flow is None:
+            raise RuntimeError("Node not in a flow.")
+        node_ref = _NodeRef(self)
+        job_id = ""
+
+        async def callback(res):
+            node = node_ref()
+            if node is not None:
+                node._on_chunk_done(job_id, res)
+
+        async def error_callback(e):
+            node = node_ref()
+            if node is not None:
+                node._on_chunk_failed(job_id, e)
+
+        from .job import AsyncJob
+        job_cls: T.Type["Job"]
+        chunk_func: T.Callable
+        func = self.node_cls.func
+        if inspect.iscoroutinefunction(func):
+            job_cls = AsyncJob
+            chunk_func = partial(_apply_chunk_async, func)
+        else:
+            job_type = self.job_type
+            if job_type == "auto":
+                # use the job type learned from the node class
+                job_type = self.session.job_profiler.job_type_of(
+                    class_key(self.node_cls)) or "thread"
+            job_cls = job_type_classes[job_type]
+            chunk_func = partial(_apply_chunk, func)
+        job = job_cls(
+            chunk_func, (chunk,), name=self.node_cls.__name__,
+            callback=callback,
+            error_callback=error_callback,
+        )
+        job_id = job.id
+        fut = asyncio.get_running_loop().create_future()
+        self._chunk_futs[job_id] = fut
+        await self.session.engine.submit_async(job)
+        self.jobs_id.append(job_id)
+        return fut
+
+    async def cancel(self):
+        from .job import cancel_job
+        await super().cancel()
+        cancel_tasks(self._tasks)
+        jobs = self.session.engine.jobs
+        for job_id in list(self._chunk_futs.keys()):
+            self._chunk_futs.pop(job_id).cancel()
+            await cancel_job(jobs.get_job_by_id(job_id))
@@ -1,20 +1,34 @@
 import typing as T
+import inspect
+import weakref
+import asyncio
+from types import MappingProxyType
 
-from executor.engine.job import Job
 from funcdesc import Description
+from funcdesc.desc import NotDef
 
 from .base import FlowElement
 from .node_port import (
-    InputPort, OutputPort,
+    NodePort, InputPort, OutputPort,
     InputDataPort, InputExecPort,
     OutputDataPort, OutputExecPort,
+    PortLayout, current_signal_tag, with_signal_tag,
 )
 from .connection import Connection
-from .utils import CheckAttrRange, job_type_classes, JOB_TYPES
+from .utils import (
+    CheckAttrRange, job_type_classes, JOB_TYPES, payload_size,
+    cancel_tasks)
+from .profile import (
+    class_key, profiled_call, timed_call, timed_call_async
+)
 from .utils import logger
+from .remote import (
+    RemoteRef, fetch_value, unwrap_remote, get_remote_job_class
+)
 
 
 if T.TYPE_CHECKING:
+    from executor.engine.job import Job
     from .node_port import Port
     from .flow import Flow
 
@@ -28,56 +42,127 @@ class ExecMode(CheckAttrRange):
         obj.clear_signal_buffers()
 
 
+class OnError(CheckAttrRange):
+    valid_range = ("skip", "default", "fail_flow")
+    attr = "_on_error"
+
+
 class Node(FlowElement):
     """Base class of all nodes.
 
     Args:
         exec_mode (str, optional): Execution mode of the node.
             If "all", the node will be activated only when all input ports
-            has signal. If "any", the node will be activated when any input
-            port has signal. Defaults to "all".
+            has signal, the signals tagged with the same run id are joined,
+            oldest run first(see `Flow.pipeline`). If "any", the node will
+            be activated when any input port has signal. Defaults to "all".
         name (str, optional): Name of the node. Defaults to None.
         flow (Flow, optional): Flow that the node belongs to.
+        coalesce (bool, optional): Only for "any" mode. If True,
+            the signals arrived while the node is busy are collapsed
+            into the latest one per port and run, and the follow-up runs
+            with the freshest data are launched after the running job
+            finished, one for each run(see `Flow.pipeline`).
+            Defaults to the class attribute `default_coalesce`.
+        debounce (float, optional): If set, the activation is deferred
+            until no new signal arrived in `debounce` seconds,
+            the signals arrived in the window are merged into
+            the latest one per port and run.
+            Defaults to the class attribute `default_debounce`.
+        max_rate (float, optional): If set, the node is activated at most
+            `max_rate` times per second, the signals arrived
+            between two activations are merged into the latest one
+            per port and run.
+            Defaults to the class attribute `default_max_rate`.
+        on_error (str, optional): Policy when a run of the node is failed.
+            "skip": record the error and stop the branch.
+            "default": push the default values of the output ports.
+            "fail_flow": cancel the flow, the error will be raised
+            from `Flow.__call__`. The errors are recorded in `Flow.errors`.
+            Defaults to the class attribute `default_on_error`.
         **kwargs: Other attributes of the node.
 
     Attributes:
         input_ports (List[InputPort]): Input ports of the node.
         output_ports (List[OutputPort]): Output ports of the node.
         exec_mode (str): Execution mode of the node.
+        coalesce (bool): Whether to coalesce the signals when busy.
+        debounce (Optional[float]): Debounce time window in seconds.
+        max_rate (Optional[float]): Maximum activations per second.
+        on_error (str): Policy when a run of the node is failed.
         name (str): Name of the node.
         jobs_id (List[str]): Ids of all jobs that the node submitted.
+        port_layout (PortLayout): Port layout shared by the node class.
     """
     _instances_count = 0
+    _port_layout: T.Optional[PortLayout] = None
 
     init_input_ports: T.List["Port"] = []
     init_output_ports: T.List["Port"] = []
 
     default_exec_mode: T.Literal['all', 'any'] = "all"
     exec_mode = ExecMode()
+    default_coalesce: bool = False
+    default_debounce: T.Optional[float] = None
+    default_max_rate: T.Optional[float] = None
+    default_on_error: T.Literal["skip", "default", "fail_flow"] = "skip"
+    on_error = OnError()
+    _name: T.Optional[str] = None
+    # states of the activation, the instances set them when changed
+    _coalesced: bool = False
+    _activate_handle: T.Optional[asyncio.TimerHandle] = None
+    _activate_task: T.Optional[asyncio.Task] = None
+    _last_activate_time: T.Optional[float] = None
+    # increased on cancel, results of the old runs are dropped
+    _epoch: int = 0
 
     def __init__(
             self,
             exec_mode: str = default_exec_mode,
             name: T.Optional[str] = None,
             flow: T.Optional["Flow"] = None,
+            coalesce: T.Optional[bool] = None,
+            debounce: T.Optional[float] = None,
+            max_rate: T.Optional[float] = None,
+            on_error: T.Optional[str] = None,
             **kwargs
             ) -> None:
         super().__init__(flow=flow)
         self.setup_ports()
         self.exec_mode = exec_mode
+        if coalesce is None:
+            coalesce = self.default_coalesce
+        self.coalesce = coalesce
+        self.debounce = self.default_debounce if debounce is None \
+            else debounce
+        self.max_rate = self.default_max_rate if max_rate is None \
+            else max_rate
+        self.on_error = self.default_on_error \
+            if on_error is None else on_error  # type: ignore
         if name is None:
             name = self._get_name()
         self.name = name
         self.jobs_id: T.List[str] = []
         self.attrs = kwargs
 
+    @property
+    def name(self) -> str:
+        return self._name  # type: ignore
+
+    @name.setter
+    def name(self, name: str):
+        old_name = self._name
+        self._name = name
+        if self._flow is not None:
+            self._flow._update_name_index(self, old_name)
+
     @property
     def connections(self) -> T.List["Connection"]:
-        conns = []
-        for port in self.input_ports:
-            conns.extend(port.connections)
-        for port in self.output_ports:
-            conns.extend(port.connections)
+        conns: T.List["Connection"] = []
+        for inp in self.input_ports:
+            conns.extend(inp.connections)
+        for outp in self.output_ports:
+            conns.extend(outp.connections)
         return conns
 
     def copy(self, name: T.Optional[str] = None) -> "Node":
@@ -86,9 +171,26 @@ class Node(FlowElement):
         node = self.__class__(
             exec_mode=self.exec_mode,
             name=new_name,
+            coalesce=self.coalesce,
+            debounce=self.debounce,
+            max_rate=self.max_rate,
+            on_error=self.on_error,
         )
         return node
 
+    def get_init_kwargs(self) -> T.Dict[str, T.Any]:
+        """Return the keyword arguments for re-create the node."""
+        kwargs = {
+            "exec_mode": self.exec_mode,
+            "name": self.name,
+            "coalesce": self.coalesce,
+            "debounce": self.debounce,
+            "max_rate": self.max_rate,
+            "on_error": self.on_error,
+        }
+        kwargs.update(self.attrs)
+        return kwargs
+
     def _get_name(self) -> str:
         """Return a name for the node."""
         cls = self.__class__
@@ -102,13 +204,36 @@ class Node(FlowElement):
             return f"<Node type={self.__class__.__name__} name={self.name}>"
         return f"<Node type={self.__class__.__name__} id={self.id}>"
 
+    @classmethod
+    def get_port_layout(cls) -> PortLayout:
+        """Return the compiled port layout of the node class.
+        The layout is built on first use and cached on the class."""
+        layout: T.Optional[PortLayout] = cls.__dict__.get("_port_layout")
+        if (layout is None) or (not layout.built_from(
+                cls.init_input_ports, cls.init_output_ports)):
+            layout = PortLayout(cls.init_input_ports, cls.init_output_ports)
+            cls._port_layout = layout
+        return layout
+
     def setup_ports(self):
-        self.input_ports = [
-            bp.to_input_port(self) for bp in self.init_input_ports
-        ]
-        self.output_ports = [
-            bp.to_output_port(self) for bp in self.init_output_ports
-        ]
+        self._apply_layout(self.get_port_layout())
+
+    def _apply_layout(self, layout: PortLayout):
+        """Create the ports of the node from the layout."""
+        self.port_layout = layout
+        self.input_ports = layout.create_input_ports(self)
+        self.output_ports = layout.create_output_ports(self)
+
+    def get_port(self, name: str) -> NodePort:
+        """Get port by name, the input ports are searched first."""
+        layout = self.port_layout
+        idx = layout.input_index.get(name)
+        if idx is not None:
+            return self.input_ports[idx]
+        idx = layout.output_index.get(name)
+        if idx is not None:
+            return self.output_ports[idx]
+        raise KeyError(f"No port named {name} in node {self}.")
 
     def clear_signal_buffers(self):
         """Clear all signal buffers of input ports."""
@@ -130,20 +255,207 @@ class Node(FlowElement):
         ])
         return caches
 
+    @property
+    def is_busy(self) -> bool:
+        """Whether the node has running jobs."""
+        return False
+
+    def _merge_signals(self):
+        """Keep only the latest signal of each run(tag) in the input ports,
+        the untagged signals are merged into the latest one."""
+        for inp in self.input_ports:
+            buf = inp.signal_buffer
+            if len(buf) <= 1:
+                continue
+            seen: T.Set[T.Optional[int]] = set()
+            kept = []
+            for sig in reversed(buf):
+                if sig.tag not in seen:
+                    seen.add(sig.tag)
+                    kept.append(sig)
+            buf.clear()
+            buf.extend(reversed(kept))
+
+    def _n_signals(self) -> int:
+        return sum(len(inp.signal_buffer) for inp in self.input_ports)
+
+    def _coalesce_signals(self):
+        self._merge_signals()
+        self._coalesced = True
+
+    @property
+    def has_deferred_activation(self) -> bool:
+        """Whether the node has an activation deferred by
+        `debounce` or `max_rate`."""
+        if self._activate_handle is not None:
+            return True
+        task = self._activate_task
+        return (task is not None) and (not task.done())
+
+    @property
+    def has_pending_tasks(self) -> bool:
+        """Whether the node has work running on the event loop
+        which not managed by the engine, like deferred activations."""
+        return self.has_deferred_activation
+
+    def _defer_activation(self) -> bool:
+        """Schedule the deferred activation if needed.
+        Return False if the node can be activated immediately."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        delay = 0.0
+        if self.debounce:
+            delay = self.debounce
+            if self._activate_handle is not None:
+                self._activate_handle.cancel()
+                self._activate_handle = None
+        elif self._activate_handle is not None:
+            # already scheduled, signals will be merged
+            return True
+        if self.max_rate and (self._last_activate_time is not None):
+            next_time = self._last_activate_time + 1.0 / self.max_rate
+            delay = max(delay, next_time - now)
+        if delay <= 0:
+            return False
+        self._activate_handle = loop.call_later(
+            delay, self._on_deferred_activate)
+        return True
+
+    def _on_deferred_activate(self):
+        self._activate_handle = None
+        loop = asyncio.get_running_loop()
+        self._activate_task = loop.create_task(self._activate_deferred())
+
+    async def _activate_deferred(self):
+        self._last_activate_time = asyncio.get_running_loop().time()
+        self._merge_signals()
+        await self._activate_pending()
+
     async def activate(self):
+        if self.debounce or self.max_rate:
+            if self._defer_activation():
+                return
+            self._last_activate_time = asyncio.get_running_loop().time()
+        await self._activate_pending()
+
+    async def _activate_pending(self):
+        """Activate the node until the pending signals are consumed,
+        the merged signals of different runs are run one by one.
+        Stop when the signals are kept, e.g. waiting for the other
+        signals of the run, or coalesced."""
+        n = self._n_signals()
+        while n > 0:
+            await self._activate()
+            n_left = self._n_signals()
+            if n_left >= n:
+                break
+            n = n_left
+
+    async def cancel(self):
+        """Cancel the pending work of the node: clear the signal buffers
+        and the deferred activations. Results of the cancelled runs
+        will not activate the successors."""
+        self._epoch += 1
+        self.clear_signal_buffers()
+        self._coalesced = False
+        if self._activate_handle is not None:
+            self._activate_handle.cancel()
+            self._activate_handle = None
+        task = self._activate_task
+        if (task is not None) and (not task.done()):
+            task.cancel()
+        self._activate_task = None
+
+    async def _on_job_finished(self):
+        """Launch the follow-up run for the coalesced signals."""
+        if self._coalesced and (not self.is_busy):
+            self._coalesced = False
+            await self.activate()
+
+    def _record_run(self):
+        flow = self._flow
+        if (flow is not None) and (flow.recorder is not None):
+            flow.recorder.on_run(self)
+
+    def _match_tags(self) -> T.Tuple[bool, T.Optional[int]]:
+        """Find the oldest tag which all the ports have a signal with,
+        and move the matched signals to be consumed next.
+        The ports with only untagged signals match any tag,
+        if no port has tagged signal, the newest signals are consumed.
+
+        Returns:
+            Whether matched, and the matched tag.
+        """
+        port_tags = [
+            {sig.tag for sig in inp.signal_buffer if sig.tag is not None}
+            for inp in self.input_ports
+        ]
+        tag_sets = [tags for tags in port_tags if tags]
+        if not tag_sets:
+            return True, None
+        common = set.intersection(*tag_sets)
+        if not common:
+            return False, None
+        tag = min(common)
+        for inp, tags in zip(self.input_ports, port_tags):
+            if tags:
+                inp.select_signal(tag)
+        return True, tag
+
+    def _select_any_tag(self) -> T.Tuple[T.Optional[int], T.List[bool]]:
+        """Select the signals to consume for the "any" mode: the oldest
+        tag in the buffers, and the untagged signals.
+
+        Returns:
+            The selected tag, and whether consume each port.
+        """
+        tags = {
+            sig.tag for inp in self.input_ports
+            for sig in inp.signal_buffer if sig.tag is not None
+        }
+        if not tags:
+            return None, [
+                len(inp.signal_buffer) > 0 for inp in self.input_ports]
+        tag = min(tags)
+        ports = []
+        for inp in self.input_ports:
+            buf = inp.signal_buffer
+            if any(sig.tag == tag for sig in buf):
+                inp.select_signal(tag)
+                ports.append(True)
+            else:
+                ports.append(
+                    (len(buf) > 0) and (buf[-1].tag is None))
+        return tag, ports
+
+    async def _activate(self):
         bufs_has_signal = [
             len(inp.signal_buffer) > 0 for inp in self.input_ports
         ]
         if self.exec_mode == "all":
             if all(bufs_has_signal):
+                matched, tag = self._match_tags()
+                if not matched:
+                    # wait for the signals of the same run
+                    return
                 logger.info(f"{self} activated.")
                 args = self.consume_all_ports()
-                await self.run(*args)
+                self._record_run()
+                await self._run_with_tag(tag, args)
         else:
             if any(bufs_has_signal):
+                if self.coalesce and self.is_busy:
+                    self._coalesce_signals()
+                    return
                 logger.info(f"{self} activated.")
-                args = self.consume_ports_with_cache()
-                await self.run(*args)
+                tag, ports = self._select_any_tag()
+                args = self.consume_ports_with_cache(ports)
+                self._record_run()
+                await self._run_with_tag(tag, args)
+
+    async def _run_with_tag(self, tag: T.Optional[int], args: list):
+        """Run the node, the output signals carry the tag."""
+        await with_signal_tag(tag, self.run(*args))
 
     def consume_all_ports(self) -> T.List[T.Any]:
         """Consume one signal of all ports.
@@ -159,23 +471,32 @@ class Node(FlowElement):
                 inp.get_signal()
         return args
 
-    def consume_ports_with_cache(self) -> T.List[T.Any]:
+    def consume_ports_with_cache(
+            self, ports: T.Optional[T.List[bool]] = None
+            ) -> T.List[T.Any]:
         """Consume one signal of all ports.
         If a InputDataPort not has signal,
         will replace with the predecessor's cache or
         it's default value.
+
+        Args:
+            ports: Whether consume the signal of each port, the skipped
+                ports are treated as no signal. Defaults to all ports.
         """
         args = []
-        for inp in self.input_ports:
+        for idx, inp in enumerate(self.input_ports):
+            has_signal = len(inp.signal_buffer) > 0
+            if ports is not None:
+                has_signal = has_signal and ports[idx]
             if isinstance(inp, InputDataPort):
-                if len(inp.signal_buffer) > 0:
+                if has_signal:
                     data = inp.get_data()
                 else:
                     data = inp.fetch_missing()
                 args.append(data)
             else:
                 assert isinstance(inp, InputExecPort)
-                if len(inp.signal_buffer) > 0:
+                if has_signal:
                     inp.get_signal()
         return args
 
@@ -198,6 +519,33 @@ class Node(FlowElement):
     async def run(self, *args):
         pass
 
+    async def error_callback(self, e: Exception):
+        """Called when a run is failed(for ComputeNode, the job is failed
+        and no retries remain), handle the error according to
+        the `on_error` policy."""
+        logger.error(f"{self} failed: {repr(e)}")
+        flow = self.flow
+        if flow is not None:
+            flow.add_error(self, e)
+        if self.on_error == "default":
+            await self.set_default_outputs()
+        elif (self.on_error == "fail_flow") and (flow is not None):
+            await flow.fail(e)
+
+    async def set_default_outputs(self):
+        """Push the default values of the output ports."""
+        for idx, port in enumerate(self.output_ports):
+            default = None
+            if isinstance(port, OutputDataPort):
+                default = port.val_desc.default
+                if default is NotDef:
+                    default = None
+            try:
+                await self.set_output(idx, default)
+            except (TypeError, ValueError) as e:
+                logger.warning(
+                    f"Can not set default value of {port}: {repr(e)}")
+
     def connect_with(
             self, other: "Node",
             self_port_idx: int, other_port_idx: int) -> "Node":
@@ -215,15 +563,8 @@ class Node(FlowElement):
         return res
 
     def _get_call_args(self, *args, **kwargs) -> T.List[T.Any]:
-        name_to_idx = {}
-        _args = []
-        idx = 0
-        for inp in self.input_ports:
-            if not isinstance(inp, InputDataPort):
-                continue
-            name_to_idx[inp.name] = idx
-            _args.append(inp.val_desc.default)
-            idx += 1
+        name_to_idx = self.port_layout.data_input_index
+        _args = list(self.port_layout.data_input_defaults)
         for idx, a in enumerate(args):
             _args[idx] = a
         for k, a in kwargs.items():
@@ -260,31 +601,153 @@ class Node(FlowElement):
         self.activate()
 
 
+class _NodeRef():
+    """Weak reference to a node, used in the job callbacks.
+    It is pickled as a dead reference, because the engine may
+    serialize the finished jobs."""
+    def __init__(self, node: T.Optional[T.Any] = None) -> None:
+        self._ref = None if node is None else weakref.ref(node)
+
+    def __call__(self) -> T.Optional[T.Any]:
+        if self._ref is None:
+            return None
+        return self._ref()
+
+    def __reduce__(self):
+        return (_NodeRef, ())
+
+
+# read-only placeholders of the containers, created on first write
+_EMPTY_DICT: T.Any = MappingProxyType({})
+_EMPTY_SET: T.Any = frozenset()
+
+
 class JobType(CheckAttrRange):
-    valid_range = ("local", "thread", "process", "dask")
+    valid_range = ("local", "thread", "process", "dask", "auto")
     attr = "_job_type"
 
 
 class ComputeNode(Node):
+    """Node that submit it's `func` as a job to the engine.
+
+    If the `func` is a coroutine function, it will run as a task on the
+    event loop of the engine, the `job_type` is ignored.
+
+    Args:
+        job_type (str, optional): Type of the job, one of
+            "local", "thread", "process", "dask" and "auto".
+            "auto" means the job type is learned by profiling the first
+            runs of the node class, see `sunmao.core.profile.JobProfiler`,
+            if a job with the learned type is failed, the class is
+            profiled again.
+            Defaults to "thread".
+        remote_data (bool, optional): Only for "dask" job type.
+            If True, the results are kept on the dask workers and
+            passed to the successors as `RemoteRef`, they will be fetched
+            to the driver only when needed. Defaults to False.
+        worker (str, optional): Only for the remote data mode.
+            Address of the dask worker to run the jobs, the results
+            stay in it's memory. Defaults to the class attribute
+            `default_worker`, None for any worker.
+            See `sunmao.core.placement` for planning it.
+        timeout (float, optional): Timeout of the job in seconds.
+            When timeout, the job is cancelled and the `error_callback`
+            is called with a `TimeoutError`.
+            Defaults to the class attribute `default_timeout`.
+        retries (int, optional): Number of retries when the job is failed.
+            Defaults to the class attribute `default_retries`.
+        backoff (float, optional): Delay(seconds) before the first retry,
+            doubled for each following retry.
+            Defaults to the class attribute `default_backoff`.
+        on_error (str, optional): Policy when the job is failed and
+            no retries remain. "skip": record the error and stop the branch.
+            "default": push the default values of the output ports.
+            "fail_flow": cancel the flow, the error will be raised
+            from `Flow.__call__`. The errors are recorded in `Flow.errors`.
+            Defaults to the class attribute `default_on_error`.
+
+    Attributes:
+        inflight_args (Dict[str, tuple]): Arguments of the running jobs,
+            keyed by job id. Used for checkpointing.
+    """
 
     default_job_type: JOB_TYPES = "thread"
     job_type = JobType()
+    # states of the jobs, the empty ones are shared by the nodes
+    # which never submitted a job, see `_init_job_states`
+    inflight_args: T.Dict[str, tuple] = _EMPTY_DICT
+    _attempts: T.Dict[str, int] = _EMPTY_DICT
+    _timeout_handles: T.Dict[str, asyncio.TimerHandle] = _EMPTY_DICT
+    _retry_tasks: T.Set[asyncio.Task] = _EMPTY_SET
+    default_worker: T.Optional[str] = None
     func_desc: Description
+    default_timeout: T.Optional[float] = None
+    default_retries: int = 0
+    default_backoff: float = 0.0
 
     def __init__(
             self,
             exec_mode: str = Node.default_exec_mode,
             name: T.Optional[str] = None,
             job_type: JOB_TYPES = default_job_type,
+            remote_data: bool = False,
+            worker: T.Optional[str] = None,
+            timeout: T.Optional[float] = None,
+            retries: T.Optional[int] = None,
+            backoff: T.Optional[float] = None,
+            on_error: T.Optional[str] = None,
             **kwargs) -> None:
-        super().__init__(exec_mode=exec_mode, name=name, **kwargs)
+        super().__init__(
+            exec_mode=exec_mode, name=name, on_error=on_error, **kwargs)
         self.job_type = job_type  # type: ignore
+        self.remote_data = remote_data
+        self.worker = self.default_worker if worker is None else worker
+        self.timeout = self.default_timeout if timeout is None else timeout
+        self.retries = self.default_retries if retries is None else retries
+        self.backoff = self.default_backoff if backoff is None else backoff
+
+    def _init_job_states(self):
+        """Create the containers of the job states on the first submit."""
+        if "inflight_args" not in self.__dict__:
+            self.inflight_args = {}
+            self._attempts = {}
+            self._timeout_handles = {}
+            self._retry_tasks = set()
 
     def copy(self, name: T.Optional[str] = None) -> "ComputeNode":
         node: ComputeNode = super().copy(name=name)  # type: ignore
         node.job_type = self.job_type
+        node.remote_data = self.remote_data
+        node.worker = self.worker
+        node.timeout = self.timeout
+        node.retries = self.retries
+        node.backoff = self.backoff
         return node
 
+    def get_init_kwargs(self) -> T.Dict[str, T.Any]:
+        kwargs = super().get_init_kwargs()
+        kwargs["job_type"] = self.job_type
+        kwargs["remote_data"] = self.remote_data
+        kwargs["worker"] = self.worker
+        kwargs["timeout"] = self.timeout
+        kwargs["retries"] = self.retries
+        kwargs["backoff"] = self.backoff
+        return kwargs
+
+    @property
+    def is_busy(self) -> bool:
+        return len(self.inflight_args) > 0
+
+    @property
+    def is_async(self) -> bool:
+        """Whether the `func` is a coroutine function."""
+        return inspect.iscoroutinefunction(self.func)
+
+    @property
+    def is_remote(self) -> bool:
+        """Whether the results of the node are kept on the dask workers."""
+        return self.remote_data and (self.job_type == "dask")
+
     def __repr__(self) -> str:
         if self.name is not None:
             return (
@@ -293,36 +756,180 @@ class ComputeNode(Node):
             )
         return f"<ComputeNode type={self.__class__.__name__} id={self.id}>"
 
-    @staticmethod
-    async def callback(flow_id: str, node_id: str, res):
-        from .session import Session
-        sess = Session.get_current()
-        node = sess.flows[flow_id].nodes[node_id]
-        await node.set_outputs(res)
+    async def callback(self, res):
+        """Called when the job is done."""
+        await self.set_outputs(res)
+
+    def _finish_job(self, job_id: str):
+        self.inflight_args.pop(job_id, None)
+        self._attempts.pop(job_id, None)
+        handle = self._timeout_handles.pop(job_id, None)
+        if handle is not None:
+            handle.cancel()
+
+    async def _on_job_done(
+            self, job_id: str, epoch: int, res: T.Any,
+            run_time: T.Optional[float] = None):
+        if self._epoch != epoch:
+            # the run is cancelled
+            return
+        flow = self._flow
+        if (run_time is not None) and (flow is not None) and \
+                (flow.recorder is not None):
+            flow.recorder.on_job_done(self, run_time, res)
+        try:
+            await self.callback(res)
+        finally:
+            self._finish_job(job_id)
+        await self._on_job_finished()
+
+    async def _on_job_failed(self, job_id: str, epoch: int, e: Exception):
+        if self._epoch != epoch:
+            return
+        attempt = self._attempts.get(job_id, 0)
+        if attempt < self.retries:
+            delay = self.backoff * (2 ** attempt)
+            logger.warning(
+                f"{self} failed: {repr(e)}, retry after {delay}s.")
+            # wait outside the job's callback,
+            # so the failed job finishes and releases it's resource
+            loop = asyncio.get_running_loop()
+            task = loop.create_task(
+                self._retry(job_id, epoch, attempt, delay))
+            self._retry_tasks.add(task)
+            task.add_done_callback(self._retry_tasks.discard)
+            return
+        self._finish_job(job_id)
+        await self.error_callback(e)
+        await self._on_job_finished()
+
+    async def _retry(
+            self, job_id: str, epoch: int, attempt: int, delay: float):
+        await asyncio.sleep(delay)
+        if (self._epoch == epoch) and (job_id in self.inflight_args):
+            args = self.inflight_args[job_id]
+            await self._submit(args, attempt + 1)
+        self._finish_job(job_id)
 
-    @staticmethod
-    async def error_callback(flow_id: str, node_id: str, e: Exception):
-        print(str(e))
+    @property
+    def has_pending_tasks(self) -> bool:
+        return super().has_pending_tasks or (len(self._retry_tasks) > 0)
+
+    def _on_job_timeout(self, job: "Job"):
+        self._timeout_handles.pop(job.id, None)
+        loop = asyncio.get_running_loop()
+        loop.create_task(self._cancel_timeout_job(job))
+
+    async def _cancel_timeout_job(self, job: "Job"):
+        if job.id not in self.inflight_args:
+            return
+        from .job import cancel_job
+        logger.warning(f"{job} of {self} timeout after {self.timeout}s.")
+        await cancel_job(job)
+        await self._on_job_failed(
+            job.id, self._epoch,
+            TimeoutError(f"{self} timeout after {self.timeout}s."))
+
+    async def cancel(self):
+        """Cancel the running jobs and the pending work of the node."""
+        from .job import cancel_job
+        await super().cancel()
+        cancel_tasks(self._retry_tasks)
+        jobs = self.session.engine.jobs
+        for job_id in list(self.inflight_args.keys()):
+            self._finish_job(job_id)
+            await cancel_job(jobs.get_job_by_id(job_id))
 
     async def run(self, *args) -> "Job":
+        return await self._submit(args, 0)
+
+    async def _submit(self, args: tuple, attempt: int) -> "Job":
         if self.flow is None:
             raise RuntimeError("Node not in a flow.")
-        job_cls: T.Type[Job]
-        job_cls = job_type_classes[self.job_type]
-        flow_id = self.flow.id
-        node_id = self.id
-        _callback = self.callback
-        _error_callback = self.error_callback
+        self._init_job_states()
+        from .job import AsyncJob
+        job_cls: T.Type["Job"]
+        job_kwargs: T.Dict[str, T.Any] = {}
+        profiling = False
+        # the job runs with the job type learned by the profiler
+        migrated = False
+        # measure the run time in the job for the recorder
+        timed = False
+        in_bytes = 0
+        if self.is_remote and (not self.is_async):
+            job_cls = get_remote_job_class()
+            job_kwargs["n_outputs"] = len(self.output_ports)
+            job_kwargs["worker"] = self.worker
+            args = tuple(unwrap_remote(a) for a in args)
+        else:
+            if any(isinstance(a, RemoteRef) for a in args):
+                args = tuple([await fetch_value(a) for a in args])
+            timed = self.flow.recorder is not None
+            if self.is_async:
+                job_cls = AsyncJob
+            else:
+                job_type = self.job_type
+                if job_type == "auto":
+                    job_type = self._auto_job_type()
+                    profiling = job_type is None
+                    if profiling:
+                        job_type = "thread"
+                        in_bytes = payload_size(args)
+                    else:
+                        migrated = job_type != "thread"
+                job_cls = job_type_classes[job_type]
+        # Bind the callbacks to the node at submit time,
+        # instead of looking it up from the current session.
+        node_ref = _NodeRef(self)
         _func = self.func
+        job_id = ""
+        epoch = self._epoch
+        tag = current_signal_tag()
 
         async def callback(res):
-            await _callback(flow_id, node_id, res)
+            node = node_ref()
+            run_time = None
+            if profiling:
+                res, (wall, gil, out_bytes) = res
+                if timed:
+                    run_time = wall
+                if node is not None:
+                    node.session.job_profiler.record(
+                        class_key(type(node)), wall, gil, in_bytes, out_bytes)
+            elif timed:
+                res, run_time = res
+            if node is not None:
+                await with_signal_tag(
+                    tag, node._on_job_done(job_id, epoch, res, run_time))
 
         async def error_callback(e):
-            await _error_callback(flow_id, node_id, e)
-
-        def func(*args):
-            return _func(*args)
+            node = node_ref()
+            if (node is not None) and migrated:
+                # e.g. the func or data can not be pickled for process
+                logger.warning(
+                    f"{node} failed with the learned job type, "
+                    "profile the node class again.")
+                node.session.job_profiler.reset(type(node))
+            if node is not None:
+                await with_signal_tag(
+                    tag, node._on_job_failed(job_id, epoch, e))
+
+        func: T.Callable
+        if self.is_async and timed:
+            async def func(*args):
+                return await timed_call_async(_func, *args)
+        elif self.is_async:
+            async def func(*args):
+                return await _func(*args)
+        elif profiling:
+            def func(*args):
+                return profiled_call(_func, *args)
+        elif timed:
+            def func(*args):
+                return timed_call(_func, *args)
+        else:
+            def func(*args):
+                return _func(*args)
 
         func.__name__ = self.__class__.__name__ + ".func"
 
@@ -330,11 +937,25 @@ class ComputeNode(Node):
             func, args, name=self.__class__.__name__,
             callback=callback,
             error_callback=error_callback,
+            **job_kwargs,
         )
+        job_id = job.id
+        self.inflight_args[job_id] = args
+        if attempt > 0:
+            self._attempts[job_id] = attempt
         await self.session.engine.submit_async(job)
         self.jobs_id.append(job.id)
+        if self.timeout is not None:
+            loop = asyncio.get_running_loop()
+            self._timeout_handles[job_id] = loop.call_later(
+                self.timeout, self._on_job_timeout, job)
         return job
 
+    def _auto_job_type(self) -> T.Optional[str]:
+        """The learned job type of the node class,
+        None if it's still being profiled."""
+        return self.session.job_profiler.job_type_of(class_key(type(self)))
+
     async def __call__(self, *args, **kwargs) -> "Job":
         _args = self._get_call_args(*args, **kwargs)
         idx = 0
@@ -1,19 +1,63 @@
 import typing as T
+import itertools
 from datetime import datetime
 from collections import deque
+from contextvars import ContextVar
 from funcdesc.desc import Value
 from funcdesc.desc import NotDef
 
 from .connection import Connection
+from .remote import RemoteRef
 
 
 if T.TYPE_CHECKING:
     from .node import Node
 
 
+# Tag of the signals pushed in the current context, it's the run id of
+# the signals consumed by the running node.
+_signal_tag: ContextVar[T.Optional[int]] = ContextVar(
+    "sunmao_signal_tag", default=None)
+_tag_counter = itertools.count()
+
+
+def new_signal_tag() -> int:
+    """Return a new run id, increasing, for tagging the input signals."""
+    return next(_tag_counter)
+
+
+def skip_signal_tags(tag: int):
+    """Make the later new run ids greater than the tag,
+    for restoring the tagged signals."""
+    global _tag_counter
+    _tag_counter = itertools.count(max(next(_tag_counter), tag + 1))
+
+
+def current_signal_tag() -> T.Optional[int]:
+    """The tag of the signals pushed in the current context."""
+    return _signal_tag.get()
+
+
+async def with_signal_tag(tag: T.Optional[int], aw: T.Awaitable) -> T.Any:
+    """Await it in the context where the pushed signals carry the tag."""
+    token = _signal_tag.set(tag)
+    try:
+        return await aw
+    finally:
+        _signal_tag.reset(token)
+
+
 class ActivateSignal():
-    def __init__(self, data: T.Any = None):
+    """Signal in the buffer of an input port.
+
+    Args:
+        data: The data carried by the signal.
+        tag: Run id of the signal, the signals derived from the same
+            flow input have the same tag. None for untagged.
+    """
+    def __init__(self, data: T.Any = None, tag: T.Optional[int] = None):
         self.data = data
+        self.tag = tag
 
 
 class NodePort():
@@ -35,13 +79,28 @@ class InputPort(NodePort):
 
     def put_signal(
             self, provider: T.Optional["OutputPort"] = None,
-            data=None):
-        self.signal_buffer.append(ActivateSignal(data))
+            data=None, tag: T.Optional[int] = None):
+        self.signal_buffer.append(ActivateSignal(data, tag))
         self.lastest_signal_provider = provider
+        if provider is None:
+            flow = self.node._flow
+            if (flow is not None) and (flow.recorder is not None):
+                flow.recorder.on_input(self, data)
 
     def get_signal(self) -> ActivateSignal:
         return self.signal_buffer.pop()
 
+    def select_signal(self, tag: int):
+        """Move the oldest signal with the tag to the end of the buffer,
+        so it will be consumed next."""
+        buf = self.signal_buffer
+        for idx, sig in enumerate(buf):
+            if sig.tag == tag:
+                del buf[idx]
+                buf.append(sig)
+                return
+        raise KeyError(f"No signal with tag {tag} in {self}.")
+
     def clear_signal_buffer(self):
         while len(self.signal_buffer) > 0:
             self.get_signal()
@@ -66,11 +125,25 @@ class OutputPort(NodePort):
     def register_callback(self, func: T.Callable[[T.Any], None]):
         self.callbacks.append(func)
 
+    def remove_callback(self, func: T.Callable[[T.Any], None]):
+        self.callbacks.remove(func)
+
     async def push_signal(self, data=None):
         for callback in self.callbacks:
             callback(data)
+        tag = _signal_tag.get()
+        flow = self.node.flow
+        active = None
+        if flow is not None:
+            if tag is not None:
+                active = flow._run_cones.get(tag)
+            if flow.recorder is not None:
+                flow.recorder.on_output(self, data)
         for s in self.successors:
-            s.put_signal(provider=self, data=data)
+            if (active is not None) and (s.node not in active):
+                # not required by the requested outputs
+                continue
+            s.put_signal(provider=self, data=data, tag=tag)
             await s.node.activate()
 
     def connect_with(self, other: InputPort):
@@ -102,6 +175,9 @@ class DataPort(NodePort):
             self.val_desc = Value(name=name)
 
     def check(self, val):
+        if isinstance(val, RemoteRef):
+            # data on the remote workers, check it when fetched
+            return
         self.val_desc.check_range(val)
         self.val_desc.check_type(val)
 
@@ -126,7 +202,8 @@ class InputDataPort(InputPort, DataPort):
             self, name: str, node: "Node",
             val_desc: T.Optional[Value] = None) -> None:
         InputPort.__init__(self, name, node)
-        DataPort.__init__(self, name, node, val_desc)
+        # skip `DataPort.__init__`, NodePort is already initialized
+        self.val_desc = Value(name=name) if val_desc is None else val_desc
 
     def get_data(self) -> T.Any:
         sig = self.signal_buffer.pop()
@@ -150,7 +227,7 @@ class OutputDataPort(OutputPort, DataPort):
             self, name: str, node: "Node", save_cache: bool = True,
             val_desc: T.Optional[Value] = None) -> None:
         OutputPort.__init__(self, name, node)
-        DataPort.__init__(self, name, node, val_desc)
+        self.val_desc = Value(name=name) if val_desc is None else val_desc
         self.save_cache = save_cache
         self.last_cache_time: T.Optional[datetime] = None
         self._cache: T.Optional[T.Any] = None
@@ -169,6 +246,15 @@ class OutputDataPort(OutputPort, DataPort):
     def get_cache(self) -> T.Any:
         return self._cache
 
+    async def fetch_cache(self) -> T.Any:
+        """Return the cache, if the data is kept on
+        remote workers, fetch it to the driver."""
+        data = self._cache
+        if isinstance(data, RemoteRef):
+            data = await data.fetch()
+            self.check(data)
+        return data
+
     def clear_cache(self):
         self._cache = None
 
@@ -235,20 +321,112 @@ class Port:
         )
         return val_desc
 
-    def to_input_port(self, node: "Node") -> InputPort:
+    def to_input_port(
+            self, node: "Node",
+            val_desc: T.Optional["Value"] = None) -> InputPort:
+        """Create an input port from the blueprint.
+        If `val_desc` is given, it will be shared instead of
+        creating a new one."""
         port: InputPort
         if self.exec:
             port = InputExecPort(self.name, node)
         else:
-            port = InputDataPort(self.name, node, self.to_val_desc())
+            if val_desc is None:
+                val_desc = self.to_val_desc()
+            port = InputDataPort(self.name, node, val_desc)
         return port
 
-    def to_output_port(self, node: "Node") -> OutputPort:
+    def to_output_port(
+            self, node: "Node",
+            val_desc: T.Optional["Value"] = None) -> OutputPort:
+        """Create an output port from the blueprint.
+        If `val_desc` is given, it will be shared instead of
+        creating a new one."""
         port: OutputPort
         if self.exec:
             port = OutputExecPort(self.name, node)
         else:
+            if val_desc is None:
+                val_desc = self.to_val_desc()
             port = OutputDataPort(
-                self.name, node, self.save_cache,
-                self.to_val_desc())
+                self.name, node, self.save_cache, val_desc)
         return port
+
+
+class PortLayout:
+    """The compiled port layout of a node class.
+
+    It is built once per node class from the port blueprints,
+    and shared by all instances of the class.
+    The `Value` descriptors are also shared between the instances.
+
+    Args:
+        input_bps (List[Port]): Blueprints of the input ports.
+        output_bps (List[Port]): Blueprints of the output ports.
+
+    Attributes:
+        input_names (Tuple[str]): Names of the input ports.
+        output_names (Tuple[str]): Names of the output ports.
+        input_index (Dict[str, int]): Map from the name of
+            input port to it's index.
+        output_index (Dict[str, int]): Map from the name of
+            output port to it's index.
+        input_val_descs (Tuple[Optional[Value]]): Shared value descriptors
+            of the input ports, None for the exec ports.
+        output_val_descs (Tuple[Optional[Value]]): Shared value descriptors
+            of the output ports, None for the exec ports.
+        data_input_index (Dict[str, int]): Map from the name of
+            input data port to it's index in the call arguments.
+        data_input_defaults (Tuple): Default values of the call arguments.
+    """
+    def __init__(
+            self,
+            input_bps: T.List[Port],
+            output_bps: T.List[Port]) -> None:
+        self.input_bps = input_bps
+        self.output_bps = output_bps
+        self._input_bps_snapshot = tuple(input_bps)
+        self._output_bps_snapshot = tuple(output_bps)
+        self.input_names = tuple(bp.name for bp in input_bps)
+        self.output_names = tuple(bp.name for bp in output_bps)
+        # reversed, the first port wins when names are duplicated
+        self.input_index = {
+            n: i for i, n in reversed(list(enumerate(self.input_names)))}
+        self.output_index = {
+            n: i for i, n in reversed(list(enumerate(self.output_names)))}
+        self.input_val_descs = tuple(
+            None if bp.exec else bp.to_val_desc() for bp in input_bps)
+        self.output_val_descs = tuple(
+            None if bp.exec else bp.to_val_desc() for bp in output_bps)
+        self.data_input_index: T.Dict[str, int] = {}
+        defaults: T.List[T.Any] = []
+        for bp, val_desc in zip(input_bps, self.input_val_descs):
+            if val_desc is None:
+                continue
+            self.data_input_index[bp.name] = len(defaults)
+            defaults.append(val_desc.default)
+        self.data_input_defaults = tuple(defaults)
+
+    def built_from(
+            self,
+            input_bps: T.List[Port],
+            output_bps: T.List[Port]) -> bool:
+        """Check if the layout is built from the given blueprints."""
+        return (
+            (self.input_bps is input_bps) and
+            (self.output_bps is output_bps) and
+            (self._input_bps_snapshot == tuple(input_bps)) and
+            (self._output_bps_snapshot == tuple(output_bps))
+        )
+
+    def create_input_ports(self, node: "Node") -> T.List[InputPort]:
+        return [
+            bp.to_input_port(node, val_desc)
+            for bp, val_desc in zip(self.input_bps, self.input_val_descs)
+        ]
+
+    def create_output_ports(self, node: "Node") -> T.List[OutputPort]:
+        return [
+            bp.to_output_port(node, val_desc)
+            for bp, val_desc in zip(self.output_bps, self.output_val_descs)
+        ]
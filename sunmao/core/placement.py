@@ -0,0 +1,210 @@
+import typing as T
+import math
+from collections import deque
+from pathlib import Path
+
+from .node import Node, ComputeNode
+
+if T.TYPE_CHECKING:
+    from .flow import Flow
+
+
+EdgeWeights = T.Dict[T.Tuple[Node, Node], float]
+
+
+def edge_weights_from_record(
+        flow: "Flow", path: T.Union[str, Path]) -> EdgeWeights:
+    """Sum the recorded payload sizes passed along each edge.
+
+    The nodes of the record are matched with the nodes of the flow
+    by name, the edges of unknown nodes are ignored.
+
+    Args:
+        flow: The flow to place.
+        path: Path of the record file, see `SignalRecorder`.
+    """
+    from .record import read_record
+    header, events = read_record(path)
+    names = [info["name"] for info in header["nodes"]]
+    port_bytes: T.Dict[T.Tuple[int, int], float] = {}
+    for _, kind, idx, p_idx, size, _ in events:
+        if (kind == "o") and size:
+            key = (idx, p_idx)
+            port_bytes[key] = port_bytes.get(key, 0.0) + size
+    weights: EdgeWeights = {}
+    for s_idx, s_port, t_idx, _ in header["edges"]:
+        try:
+            source = flow.get_node(names[s_idx])
+            target = flow.get_node(names[t_idx])
+        except (KeyError, ValueError):
+            continue
+        key = (source, target)
+        weights[key] = weights.get(key, 0.0) + \
+            port_bytes.get((s_idx, s_port), 0.0)
+    return weights
+
+
+def _neighbors(
+        flow: "Flow",
+        weights: T.Optional[EdgeWeights]
+        ) -> T.Dict[Node, T.Dict[Node, float]]:
+    """Undirected weighted adjacency of the nodes."""
+    adj: T.Dict[Node, T.Dict[Node, float]] = {
+        node: {} for node in flow.nodes.values()}
+    for conn in flow.connections.values():
+        source, target = conn.source.node, conn.target.node
+        if (source is target) or (source not in adj) or (target not in adj):
+            continue
+        if weights is None:
+            w = 1.0
+        else:
+            w = weights.get((source, target), 0.0)
+        adj[source][target] = adj[source].get(target, 0.0) + w
+        adj[target][source] = adj[target].get(source, 0.0) + w
+    return adj
+
+
+def _traverse_order(
+        adj: T.Dict[Node, T.Dict[Node, float]]) -> T.List[Node]:
+    """Breadth first order starts from the source nodes,
+    so the connected nodes are visited close to each other."""
+    order: T.List[Node] = []
+    visited: T.Set[Node] = set()
+    roots = [
+        n for n in adj
+        if all(len(p.connections) == 0 for p in n.input_ports)
+    ] + list(adj)
+    for root in roots:
+        if root in visited:
+            continue
+        visited.add(root)
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for nb in adj[node]:
+                if nb not in visited:
+                    visited.add(nb)
+                    queue.append(nb)
+    return order
+
+
+def cut_weight(
+        flow: "Flow", placement: T.Dict[Node, int],
+        weights: T.Optional[EdgeWeights] = None) -> float:
+    """Total weight of the edges across the partitions."""
+    adj = _neighbors(flow, weights)
+    total = 0.0
+    for node, nbs in adj.items():
+        for nb, w in nbs.items():
+            if placement[node] != placement[nb]:
+                total += w
+    return total / 2
+
+
+def plan_placement(
+        flow: "Flow", n_partitions: int,
+        weights: T.Optional[EdgeWeights] = None,
+        imbalance: float = 0.1,
+        n_passes: int = 4) -> T.Dict[Node, int]:
+    """Partition the nodes of the flow, minimize the total weight of
+    the edges across the partitions while keep the partitions balanced.
+
+    The nodes are assigned greedily in breadth first order, each one
+    goes to the partition it's most connected with, then the
+    assignment is refined by moving single nodes which reduce the cut.
+
+    Args:
+        flow: The flow to partition.
+        n_partitions: Number of the partitions.
+        weights: Weights of the edges keyed by `(source, target)` nodes,
+            e.g. the payload sizes from `edge_weights_from_record`.
+            Defaults to 1 for each connection.
+        imbalance: Allowed size of a partition beyond the average,
+            as a fraction of the average.
+        n_passes: Max number of the refinement passes.
+
+    Returns:
+        Partition index of each node.
+    """
+    if n_partitions < 1:
+        raise ValueError("n_partitions must be positive.")
+    adj = _neighbors(flow, weights)
+    capacity = max(1, math.ceil(len(adj) / n_partitions * (1 + imbalance)))
+    sizes = [0] * n_partitions
+    placement: T.Dict[Node, int] = {}
+
+    def connectivity(node: Node) -> T.List[float]:
+        conn = [0.0] * n_partitions
+        for nb, w in adj[node].items():
+            part = placement.get(nb)
+            if part is not None:
+                conn[part] += w
+        return conn
+
+    for node in _traverse_order(adj):
+        conn = connectivity(node)
+        part = max(
+            (p for p in range(n_partitions) if sizes[p] < capacity),
+            key=lambda p: (conn[p], -sizes[p]))
+        placement[node] = part
+        sizes[part] += 1
+
+    for _ in range(n_passes):
+        moved = False
+        for node in placement:
+            conn = connectivity(node)
+            cur = placement[node]
+            best, best_gain = cur, 0.0
+            for p in range(n_partitions):
+                if (p == cur) or (sizes[p] >= capacity):
+                    continue
+                gain = conn[p] - conn[cur]
+                if gain > best_gain:
+                    best, best_gain = p, gain
+            if best != cur:
+                placement[node] = best
+                sizes[cur] -= 1
+                sizes[best] += 1
+                moved = True
+        if not moved:
+            break
+    return placement
+
+
+def apply_placement(
+        placement: T.Dict[Node, int],
+        workers: T.List[str],
+        job_types: T.Collection[str] = ("process",),
+        ) -> T.Dict[Node, str]:
+    """Pin the compute nodes of each partition to a dask worker,
+    in the remote data mode, so the results stay on the worker and
+    only the cut edges transfer data between the workers.
+
+    Only the nodes with the given job types are pinned, the nodes
+    running in the driver (e.g. "local" or "thread") are
+    left unchanged.
+
+    Args:
+        placement: Partition index of each node.
+        workers: Addresses of the dask workers, partition `i` is
+            pinned to `workers[i % len(workers)]`.
+        job_types: Job types of the nodes to pin.
+
+    Returns:
+        Worker address of each pinned node.
+    """
+    if not workers:
+        raise ValueError("No workers to place the nodes.")
+    pinned: T.Dict[Node, str] = {}
+    for node, part in placement.items():
+        if not isinstance(node, ComputeNode):
+            continue
+        if node.job_type not in job_types:
+            continue
+        addr = workers[part % len(workers)]
+        node.job_type = "dask"  # type: ignore
+        node.remote_data = True
+        node.worker = addr
+        pinned[node] = addr
+    return pinned
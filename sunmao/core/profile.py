@@ -0,0 +1,220 @@
+import typing as T
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+from .utils import logger, payload_size
+
+
+FORMAT_VERSION = 2
+
+
+def class_key(cls: type) -> str:
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class _GILProbe(threading.Thread):
+    """A thread wakes up every `interval` seconds and measures how late
+    it gets the GIL back. The delays add up to the time the GIL is held
+    by the other threads."""
+    def __init__(self, interval: float = 1e-3) -> None:
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.held = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while True:
+            t0 = time.perf_counter()
+            if self._stop_event.wait(self.interval):
+                break
+            delay = time.perf_counter() - t0 - self.interval
+            self.held += max(0.0, delay)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def profiled_call(func: T.Callable, *args) -> T.Tuple[T.Any, tuple]:
+    """Call the function and measure it, returns the result and
+    `(wall_time, gil_time, output_size)`. The gil time is how long
+    the GIL is held while the function runs, measured by a probe thread,
+    close to the wall time means the function runs pure Python code
+    and blocks the other threads."""
+    probe = _GILProbe()
+    probe.start()
+    t0 = time.perf_counter()
+    try:
+        res = func(*args)
+    finally:
+        wall = time.perf_counter() - t0
+        probe.stop()
+    return res, (wall, probe.held, payload_size(res))
+
+
+def timed_call(func: T.Callable, *args) -> T.Tuple[T.Any, float]:
+    """Call the function, returns the result and the run time."""
+    t0 = time.perf_counter()
+    res = func(*args)
+    return res, time.perf_counter() - t0
+
+
+async def timed_call_async(
+        func: T.Callable, *args) -> T.Tuple[T.Any, float]:
+    """Await the coroutine function, returns the result and the run time."""
+    t0 = time.perf_counter()
+    res = await func(*args)
+    return res, time.perf_counter() - t0
+
+
+class ClassProfile():
+    """Accumulated measurements of a node class."""
+    def __init__(
+            self, n: int = 0, wall: float = 0.0, gil: float = 0.0,
+            in_bytes: float = 0.0, out_bytes: float = 0.0,
+            job_type: T.Optional[str] = None) -> None:
+        self.n = n
+        self.wall = wall
+        self.gil = gil
+        self.in_bytes = in_bytes
+        self.out_bytes = out_bytes
+        self.job_type = job_type
+
+    def add(self, wall: float, gil: float, in_bytes: int, out_bytes: int):
+        self.n += 1
+        self.wall += wall
+        self.gil += gil
+        self.in_bytes += in_bytes
+        self.out_bytes += out_bytes
+
+    def to_dict(self) -> dict:
+        return {
+            "n": self.n, "wall": self.wall, "gil": self.gil,
+            "in_bytes": self.in_bytes, "out_bytes": self.out_bytes,
+            "job_type": self.job_type,
+        }
+
+
+class JobProfiler():
+    """Learn the job type of the node classes with `job_type="auto"`.
+
+    The first `n_samples` runs of a class are executed in threads
+    and measured: the run time, the time the GIL is held during the run
+    and the sizes of the arguments and results. The GIL time is measured
+    by a probe thread which wakes up periodically, when the function
+    holds the GIL the probe waits for it. Then the class is migrated
+    to the cheapest job type:
+
+    - "local": the run time is shorter than `local_threshold`,
+        the overhead of the pools is not worth it.
+    - "process": the function holds the GIL in the pure Python
+        code(GIL time / run time is above `gil_ratio`), so the threads
+        can't run it in parallel, and the run time is longer than
+        the estimated cost of the process job, `process_overhead`
+        plus the payloads pickled at `transfer_rate`.
+    - "thread": otherwise, e.g. IO bound or release the GIL
+        in the C extensions.
+
+    The learned profiles are kept in memory, set the `path` to save
+    them to a JSON file, so the later sessions start tuned.
+    Use `reset` to profile a class again, e.g. it's changed.
+
+    Args:
+        path: Path of the profile file. Defaults to the environment
+            variable `SUNMAO_JOB_PROFILE`, if not set, the profiles
+            are not saved.
+        n_samples: Number of the measured runs before migrate.
+            Defaults to the class attribute `default_n_samples`.
+    """
+    default_n_samples: int = 5
+    local_threshold: float = 1e-3
+    gil_ratio: float = 0.5
+    process_overhead: float = 5e-3
+    transfer_rate: float = 5e8
+
+    def __init__(
+            self, path: T.Union[None, str, Path] = None,
+            n_samples: T.Optional[int] = None) -> None:
+        if path is None:
+            path = os.environ.get("SUNMAO_JOB_PROFILE")
+        self.path = None if path is None else Path(path)
+        self.n_samples = self.default_n_samples if n_samples is None \
+            else n_samples
+        self.profiles: T.Dict[str, ClassProfile] = {}
+        self.load()
+
+    def load(self):
+        if (self.path is None) or (not self.path.exists()):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Can not load job profile {self.path}: {e}")
+            return
+        if data.get("version") != FORMAT_VERSION:
+            return
+        for key, prof in data["classes"].items():
+            self.profiles[key] = ClassProfile(**prof)
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {
+            "version": FORMAT_VERSION,
+            "classes": {k: p.to_dict() for k, p in self.profiles.items()},
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Can not save job profile {self.path}: {e}")
+
+    def reset(self, key: T.Union[str, type]):
+        """Drop the profile of the class, it will be profiled again.
+
+        Args:
+            key: The node class or it's key(see `class_key`).
+        """
+        if isinstance(key, type):
+            key = class_key(key)
+        if self.profiles.pop(key, None) is not None:
+            self.save()
+
+    def job_type_of(self, key: str) -> T.Optional[str]:
+        """The learned job type, None if still measuring."""
+        prof = self.profiles.get(key)
+        if prof is None:
+            return None
+        return prof.job_type
+
+    def decide(self, prof: ClassProfile) -> str:
+        wall = prof.wall / prof.n
+        gil = prof.gil / prof.n
+        n_bytes = (prof.in_bytes + prof.out_bytes) / prof.n
+        if wall < self.local_threshold:
+            return "local"
+        process_cost = self.process_overhead + n_bytes / self.transfer_rate
+        if (gil / wall >= self.gil_ratio) and (wall > process_cost):
+            return "process"
+        return "thread"
+
+    def record(
+            self, key: str, wall: float, gil: float,
+            in_bytes: int, out_bytes: int):
+        """Add a measured run of the class, migrate it when
+        got enough samples."""
+        prof = self.profiles.setdefault(key, ClassProfile())
+        if prof.job_type is not None:
+            return
+        prof.add(wall, gil, in_bytes, out_bytes)
+        if prof.n >= self.n_samples:
+            prof.job_type = self.decide(prof)
+            logger.info(f"Job type of {key}: {prof.job_type}")
+            self.save()
@@ -0,0 +1,293 @@
+import typing as T
+import json
+import time
+import random
+import asyncio
+from collections import deque
+from functools import partial
+from pathlib import Path
+
+from .node import ComputeNode
+from .node_port import Port, PortLayout, ExecPort, InputExecPort
+from .serialize import _encode_obj, _decode_obj
+from .utils import logger, payload_size
+
+if T.TYPE_CHECKING:
+    from .flow import Flow
+    from .node import Node
+    from .node_port import InputPort, OutputPort
+    from .session import Session
+
+
+FORMAT_VERSION = 2
+
+
+class SignalRecorder():
+    """Record the signals of a flow to a JSON lines file.
+
+    The first line is the header, describe the structure of the flow.
+    Each following line is an event of
+    `[time, kind, node_index, port_index, size, payload]`,
+    where the kind is "i"(signal put on an input port from outside
+    the flow), "r"(node starts a run), "o"(output port pushes a signal)
+    or "d"(a job of the node is done). For the "d" events, the `size` is
+    the list of the output sizes and the `payload` is the run time of the
+    job, measured inside the job, so it does not include the time
+    waiting for the resources. The failed jobs are not recorded.
+    The signals between the nodes are not recorded,
+    they can be derived from the "o" events and the connections.
+
+    Args:
+        flow: The flow to record.
+        path: Path of the record file.
+        sizes: Whether to record the size of the payloads,
+            measured by the length of the pickled data.
+        payloads: Whether to record the payloads(pickled).
+        sample: The probability of recording a payload.
+    """
+    def __init__(
+            self, flow: "Flow", path: T.Union[str, Path],
+            sizes: bool = True,
+            payloads: bool = False,
+            sample: float = 1.0) -> None:
+        self.flow = flow
+        self.path = Path(path)
+        self.sizes = sizes
+        self.payloads = payloads
+        self.sample = sample
+        self._file: T.Optional[T.TextIO] = None
+        self._node_index: T.Dict[str, int] = {}
+        self._t0 = 0.0
+
+    def start(self):
+        if self.flow.recorder is not None:
+            raise RuntimeError(f"{self.flow} is already being recorded.")
+        nodes = list(self.flow.nodes.values())
+        self._node_index = {node.id: idx for idx, node in enumerate(nodes)}
+        header = {
+            "version": FORMAT_VERSION,
+            "flow": self.flow.name,
+            "nodes": [
+                {
+                    "name": node.name,
+                    "exec_mode": node.exec_mode,
+                    "coalesce": node.coalesce,
+                    "debounce": node.debounce,
+                    "max_rate": node.max_rate,
+                    "inputs": [
+                        [p.name, isinstance(p, ExecPort)]
+                        for p in node.input_ports],
+                    "outputs": [
+                        [p.name, isinstance(p, ExecPort)]
+                        for p in node.output_ports],
+                }
+                for node in nodes
+            ],
+            "edges": [
+                [
+                    self._node_index[c.source.node.id], c.source.index,
+                    self._node_index[c.target.node.id], c.target.index,
+                ]
+                for c in self.flow.connections.values()
+            ],
+        }
+        self._file = open(self.path, "w")
+        self._file.write(json.dumps(header, separators=(",", ":")) + "\n")
+        self._t0 = time.perf_counter()
+        self.flow.recorder = self
+        logger.info(f"Start recording {self.flow} to {self.path}")
+
+    def stop(self):
+        if self.flow.recorder is self:
+            self.flow.recorder = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _write(
+            self, kind: str, node: "Node",
+            port_idx: int, data: T.Any = None):
+        idx = self._node_index.get(node.id)
+        if (idx is None) or (self._file is None):
+            # node added after the recording started
+            return
+        t = time.perf_counter() - self._t0
+        size = None
+        payload = None
+        if kind != "r":
+            if self.sizes:
+                size = payload_size(data)
+            if self.payloads and (random.random() < self.sample):
+                try:
+                    payload = _encode_obj(data)
+                except Exception:
+                    payload = None
+        self._write_row([round(t, 6), kind, idx, port_idx, size, payload])
+
+    def _write_row(self, row: list):
+        assert self._file is not None
+        self._file.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+    def on_input(self, port: "InputPort", data: T.Any):
+        self._write("i", port.node, port.index, data)
+
+    def on_output(self, port: "OutputPort", data: T.Any):
+        self._write("o", port.node, port.index, data)
+
+    def on_run(self, node: "Node"):
+        self._write("r", node, -1)
+
+    def on_job_done(self, node: "Node", run_time: float, res: T.Any):
+        idx = self._node_index.get(node.id)
+        if (idx is None) or (self._file is None):
+            return
+        t = time.perf_counter() - self._t0
+        outs = res if isinstance(res, tuple) else (res,)
+        sizes: T.List[T.Optional[int]] = [None] * len(node.output_ports)
+        if self.sizes:
+            for p_idx, data in enumerate(outs[:len(sizes)]):
+                sizes[p_idx] = payload_size(data)
+        self._write_row(
+            [round(t, 6), "d", idx, -1, sizes, round(run_time, 6)])
+
+
+def read_record(path: T.Union[str, Path]) -> T.Tuple[dict, T.List[list]]:
+    """Read the header and the events of a record file."""
+    with open(path) as f:
+        header = json.loads(f.readline())
+        events = [json.loads(line) for line in f if line.strip()]
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported record format version: {header.get('version')}")
+    return header, events
+
+
+def _runs_of_record(
+        n_nodes: int,
+        events: T.List[list]) -> T.List[T.List[T.Tuple[float, list]]]:
+    """Extract `(duration, output_sizes)` of the runs of each node
+    from the "d" events, in the order of the jobs done."""
+    runs: T.List[T.List[T.Tuple[float, list]]] = [[] for _ in range(n_nodes)]
+    for _, kind, idx, _, sizes, run_time in events:
+        if kind == "d":
+            runs[idx].append((run_time, list(sizes)))
+    return runs
+
+
+def _stub_func(duration: float, sizes: list, *args):
+    time.sleep(duration)
+    outs = tuple(None if s is None else bytes(s) for s in sizes)
+    if len(outs) == 1:
+        return outs[0]
+    return outs
+
+
+class StubNode(ComputeNode):
+    """Node which mimics the recorded durations and output sizes,
+    the outputs are zero bytes objects with the recorded sizes.
+
+    Args:
+        inputs: `[name, is_exec]` of the input ports.
+        outputs: `[name, is_exec]` of the output ports.
+        runs: `(duration, output_sizes)` of the runs, in order.
+        **kwargs: Other arguments of `ComputeNode`.
+    """
+    def __init__(
+            self, inputs: T.List[list], outputs: T.List[list],
+            runs: T.List[T.Tuple[float, list]],
+            **kwargs) -> None:
+        self._stub_inputs = inputs
+        self._stub_outputs = outputs
+        self.runs = runs
+        self._pending_runs = deque(runs)
+        super().__init__(**kwargs)
+
+    def setup_ports(self):
+        self._apply_layout(PortLayout(
+            [Port(name, exec=e) for name, e in self._stub_inputs],
+            [Port(name, exec=e) for name, e in self._stub_outputs],
+        ))
+
+    def reset(self):
+        self._pending_runs = deque(self.runs)
+
+    async def run(self, *args):
+        if self._pending_runs:
+            duration, sizes = self._pending_runs.popleft()
+        else:
+            duration, sizes = 0.0, [
+                None if e else 0 for _, e in self._stub_outputs]
+        self.func = partial(_stub_func, duration, sizes)  # type: ignore
+        return await super().run(*args)
+
+
+class SignalReplayer():
+    """Drive a flow of `StubNode` with the recorded signals.
+
+    The stub flow has the same structure as the recorded one, the
+    external input signals arrive with the recorded timing and sizes
+    (or the recorded payloads), and each node run takes the recorded
+    duration. Used for benchmark the scheduler with real workloads.
+
+    Args:
+        path: Path of the record file.
+        session: Session of the stub flow.
+        job_type: Job type of the stub nodes.
+    """
+    def __init__(
+            self, path: T.Union[str, Path],
+            session: T.Optional["Session"] = None,
+            job_type: str = "thread") -> None:
+        from .flow import Flow
+        header, events = read_record(path)
+        node_infos = header["nodes"]
+        runs = _runs_of_record(len(node_infos), events)
+        self.flow = Flow(name=header["flow"] + "_replay", session=session)
+        self.nodes: T.List[StubNode] = [
+            StubNode(
+                info["inputs"], info["outputs"], node_runs,
+                name=info["name"], exec_mode=info["exec_mode"],
+                coalesce=info["coalesce"], debounce=info["debounce"],
+                max_rate=info["max_rate"], job_type=job_type,
+                flow=self.flow,
+            )
+            for info, node_runs in zip(node_infos, runs)
+        ]
+        self.flow.connect_many(header["edges"], self.nodes)
+        self.inputs = [e for e in events if e[1] == "i"]
+
+    async def run(self, speed: float = 1.0) -> float:
+        """Replay the input signals and wait the flow to finish.
+
+        Args:
+            speed: Speed up factor of the input arrival times.
+
+        Returns:
+            The elapsed time in seconds.
+        """
+        for node in self.nodes:
+            node.reset()
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        for t, _, idx, p_idx, size, payload in self.inputs:
+            delay = t / speed - (loop.time() - t0)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            node = self.nodes[idx]
+            port = node.input_ports[p_idx]
+            if isinstance(port, InputExecPort):
+                port.put_signal()
+            else:
+                data = _decode_obj(payload) if payload is not None \
+                    else bytes(size or 0)
+                port.put_signal(data=data)
+            await node.activate()
+        await self.flow.join()
+        return loop.time() - t0
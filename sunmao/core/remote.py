@@ -0,0 +1,87 @@
+import typing as T
+import operator
+
+from .utils import job_type_classes
+
+if T.TYPE_CHECKING:
+    from distributed import Future
+
+
+class RemoteRef():
+    """Reference to the data which kept on the dask workers.
+
+    When a ComputeNode runs with `remote_data=True`, it's outputs
+    are RemoteRef objects, the data will be fetched to the driver
+    only when it's needed.
+
+    Args:
+        future: The dask future of the data.
+    """
+    def __init__(self, future: "Future") -> None:
+        self.future = future
+
+    def __repr__(self) -> str:
+        return f"<RemoteRef key={self.future.key}>"
+
+    async def fetch(self) -> T.Any:
+        """Fetch the data to the driver."""
+        return await self.future
+
+
+async def fetch_value(val: T.Any) -> T.Any:
+    """Fetch the data if it's a RemoteRef, else return it directly."""
+    if isinstance(val, RemoteRef):
+        return await val.fetch()
+    return val
+
+
+def unwrap_remote(val: T.Any) -> T.Any:
+    """Return the dask future if it's a RemoteRef."""
+    if isinstance(val, RemoteRef):
+        return val.future
+    return val
+
+
+_remote_job_cls: T.Optional[type] = None
+
+
+def get_remote_job_class() -> type:
+    """Return the job class which keep the result on the dask workers."""
+    global _remote_job_cls
+    if _remote_job_cls is not None:
+        return _remote_job_cls
+    # raise ImportError with the install hint if dask is not installed
+    DaskJob = job_type_classes['dask']
+    from distributed import wait
+
+    class DaskRemoteJob(DaskJob):  # type: ignore
+        """Dask job which returns RemoteRef instead of the result."""
+
+        def __init__(
+                self, *args, n_outputs: int = 1,
+                worker: T.Optional[str] = None, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.n_outputs = n_outputs
+            self.worker = worker
+
+        async def run(self):
+            client = self.engine.dask_client
+            # pin the task, the result stays in the worker's memory
+            workers = None if self.worker is None else [self.worker]
+            fut = client.submit(
+                self.func, *self.args, pure=False,
+                workers=workers, allow_other_workers=False, **self.kwargs)
+            self._executor = fut
+            await wait(fut)
+            if fut.status == "error":
+                await fut  # raise the exception
+            if self.n_outputs <= 1:
+                return RemoteRef(fut)
+            return tuple(
+                RemoteRef(client.submit(
+                    operator.getitem, fut, i, workers=workers))
+                for i in range(self.n_outputs)
+            )
+
+    _remote_job_cls = DaskRemoteJob
+    return DaskRemoteJob
@@ -0,0 +1,184 @@
+import typing as T
+import json
+import pickle
+import base64
+import importlib
+
+from .node_port import OutputDataPort
+
+if T.TYPE_CHECKING:
+    from .flow import Flow
+    from .node import Node
+    from .session import Session
+
+
+FORMAT_VERSION = 1
+
+
+def get_class_path(cls: type) -> str:
+    """Return the import path of a class, like `package.module:ClassName`."""
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def import_class(path: str) -> type:
+    """Import a class from it's import path."""
+    if "<locals>" in path:
+        raise ValueError(
+            f"Class {path} is defined in a local scope, "
+            "it can not be imported, please provide it with `node_classes`."
+        )
+    mod_name, _, qualname = path.partition(":")
+    obj: T.Any = importlib.import_module(mod_name)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    if not isinstance(obj, type):
+        raise TypeError(f"{path} is not a class.")
+    return obj
+
+
+def _encode_obj(obj: T.Any) -> str:
+    return base64.b64encode(pickle.dumps(obj)).decode("ascii")
+
+
+def _decode_obj(s: str) -> T.Any:
+    return pickle.loads(base64.b64decode(s))
+
+
+def _split_kwargs(
+        node: "Node", kwargs: T.Dict[str, T.Any]
+        ) -> T.Tuple[T.Dict[str, T.Any], T.Dict[str, str]]:
+    """Split the init kwargs of the node into the JSON values and
+    the pickled values(encoded) of the others."""
+    plain = {}
+    pickled = {}
+    for key, val in kwargs.items():
+        try:
+            json.dumps(val)
+        except (TypeError, ValueError):
+            try:
+                pickled[key] = _encode_obj(val)
+            except Exception as e:
+                raise TypeError(
+                    f"Can not serialize the attribute {key!r} of {node}: "
+                    f"{repr(e)}") from e
+        else:
+            plain[key] = val
+    return plain, pickled
+
+
+def flow_to_dict(flow: "Flow", with_caches: bool = False) -> dict:
+    """Convert a flow to a dict which can be dumped as JSON.
+
+    Node classes are referenced by their import paths
+    (classes defined in local scope should be provided with
+    `node_classes` when loading),
+    connections are stored as an adjacency array with rows of
+    `[src_node, src_port, dst_node, dst_port]` indexes.
+    Node attributes which can not be stored in JSON are pickled,
+    so only load them from trusted sources.
+
+    Raises:
+        TypeError: If a node attribute can not be pickled either.
+
+    Args:
+        flow: The flow to convert.
+        with_caches: Whether to include the caches of output data ports.
+            Caches are pickled, so only load them from trusted sources.
+    """
+    node_index: T.Dict[str, int] = {}
+    classes: T.List[str] = []
+    class_index: T.Dict[type, int] = {}
+    nodes = []
+    for idx, node in enumerate(flow.nodes.values()):
+        node_index[node.id] = idx
+        cls = node.__class__
+        if cls not in class_index:
+            class_index[cls] = len(classes)
+            classes.append(get_class_path(cls))
+        kwargs, pickled = _split_kwargs(node, node.get_init_kwargs())
+        if pickled:
+            nodes.append([class_index[cls], kwargs, pickled])
+        else:
+            nodes.append([class_index[cls], kwargs])
+    edges = []
+    for conn in flow.connections.values():
+        edges.append([
+            node_index[conn.source.node.id], conn.source.index,
+            node_index[conn.target.node.id], conn.target.index,
+        ])
+    data: T.Dict[str, T.Any] = {
+        "version": FORMAT_VERSION,
+        "name": flow.name,
+        "classes": classes,
+        "nodes": nodes,
+        "edges": edges,
+    }
+    if with_caches:
+        caches = []
+        for idx, node in enumerate(flow.nodes.values()):
+            for p_idx, port in enumerate(node.output_ports):
+                if isinstance(port, OutputDataPort) and \
+                        (port.cache is not None):
+                    caches.append([idx, p_idx, _encode_obj(port.cache)])
+        data["caches"] = caches
+    return data
+
+
+def flow_from_dict(
+        data: dict,
+        session: T.Optional["Session"] = None,
+        node_classes: T.Optional[T.Dict[str, type]] = None,
+        ) -> "Flow":
+    """Create a flow from the dict created by `flow_to_dict`.
+
+    Args:
+        data: The dict to load.
+        session: The session of the new flow.
+            If not specified, will use the current session.
+        node_classes: Map from import path to node class, used for
+            resolve node classes without importing them.
+    """
+    from .flow import Flow
+    version = data.get("version")
+    if version != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported flow format version: {version}, "
+            f"expected: {FORMAT_VERSION}"
+        )
+    node_classes = node_classes or {}
+    classes = []
+    for path in data["classes"]:
+        if path in node_classes:
+            classes.append(node_classes[path])
+        else:
+            classes.append(import_class(path))
+    flow = Flow(name=data["name"], session=session)
+    nodes: T.List["Node"] = []
+    for cls_idx, kwargs, *rest in data["nodes"]:
+        if rest:
+            # the pickled attributes
+            kwargs.update({k: _decode_obj(v) for k, v in rest[0].items()})
+        node = classes[cls_idx](flow=flow, **kwargs)
+        nodes.append(node)
+    flow.connect_many(data["edges"], nodes)
+    for idx, p_idx, enc in data.get("caches", []):
+        nodes[idx].output_ports[p_idx].cache = _decode_obj(enc)
+    return flow
+
+
+def dump_flow(flow: "Flow", path: str, with_caches: bool = False):
+    """Dump a flow to a JSON file."""
+    data = flow_to_dict(flow, with_caches=with_caches)
+    with open(path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+
+
+def load_flow(
+        path: str,
+        session: T.Optional["Session"] = None,
+        node_classes: T.Optional[T.Dict[str, type]] = None,
+        ) -> "Flow":
+    """Load a flow from a JSON file."""
+    with open(path) as f:
+        data = json.load(f)
+    return flow_from_dict(data, session=session, node_classes=node_classes)
@@ -1,39 +1,81 @@
 import typing as T
-
-from executor.engine import Engine, EngineSetting
+import threading
+from contextvars import ContextVar
 
 from .base import SunmaoObj
 from .flow import Flow
 from .utils import logger
 
+if T.TYPE_CHECKING:
+    from executor.engine import Engine, EngineSetting
+    from .profile import JobProfiler
+
+
+# The process-wide default session, shared by all threads and tasks.
+_default_session: T.Optional["Session"] = None
+_default_lock = threading.Lock()
 
-_current_session: T.Optional["Session"] = None
+# Explicit overrides by `with Session()` or `with flow`, context local,
+# so the overrides in different threads and tasks are independent.
+_current_session: ContextVar[T.Optional["Session"]] = ContextVar(
+    "sunmao_current_session", default=None)
+# tokens of the nested overrides, for restoring on exit
+_session_tokens: ContextVar[tuple] = ContextVar(
+    "sunmao_session_tokens", default=())
 
 
 def _get_current() -> T.Optional["Session"]:
-    return _current_session
+    return _current_session.get()
+
+
+def _push_current(sess: "Session"):
+    token = _current_session.set(sess)
+    _session_tokens.set(_session_tokens.get() + (token,))
 
 
-def _set_current(sess: "Session"):
-    global _current_session
-    _current_session = sess
-    logger.info(f"Current session: {sess}")
+def _pop_current():
+    tokens = _session_tokens.get()
+    _session_tokens.set(tokens[:-1])
+    _current_session.reset(tokens[-1])
 
 
 class Session(SunmaoObj):
     def __init__(
             self,
-            engine_setting: T.Optional[EngineSetting] = None,
+            engine_setting: T.Optional["EngineSetting"] = None,
             ) -> None:
         super().__init__()
         self.flows: T.Dict[str, Flow] = {}
         self._current_flow: T.Optional[Flow] = None
-        self.engine = Engine(setting=engine_setting)
+        self._engine_setting = engine_setting
+        self._engine: T.Optional["Engine"] = None
         self._env_flow: T.Optional[Flow] = None
+        self._job_profiler: T.Optional["JobProfiler"] = None
 
     def __repr__(self) -> str:
         return f"<Session id={self.id}>"
 
+    @property
+    def engine(self) -> "Engine":
+        """The engine of the session, created on first use."""
+        if self._engine is None:
+            from executor.engine import Engine
+            self._engine = Engine(setting=self._engine_setting)
+        return self._engine
+
+    @property
+    def job_profiler(self) -> "JobProfiler":
+        """The profiler of the nodes with `job_type="auto"`,
+        created on first use."""
+        if self._job_profiler is None:
+            from .profile import JobProfiler
+            self._job_profiler = JobProfiler()
+        return self._job_profiler
+
+    @job_profiler.setter
+    def job_profiler(self, profiler: "JobProfiler"):
+        self._job_profiler = profiler
+
     @property
     def current_flow(self) -> T.Optional[Flow]:
         return self._current_flow
@@ -50,20 +92,24 @@ class Session(SunmaoObj):
 
     @classmethod
     def get_current(cls) -> "Session":
+        """The session set by `with`, or the process-wide default
+        session, created on first use."""
+        global _default_session
         sess = _get_current()
-        if sess is None:
-            sess = cls()
-            _set_current(sess)
-        return sess
+        if sess is not None:
+            return sess
+        with _default_lock:
+            if _default_session is None:
+                _default_session = cls()
+                logger.info(f"Default session: {_default_session}")
+            return _default_session
 
     def __enter__(self):
-        self._prev_session = _current_session
-        _set_current(self)
+        _push_current(self)
         return self
 
     def __exit__(self, *args):
-        _set_current(self._prev_session)
-        self._prev_session = None
+        _pop_current()
 
     async def join(
             self,
@@ -0,0 +1,283 @@
+import typing as T
+import os
+import pickle
+import asyncio
+import itertools
+import multiprocessing
+import concurrent.futures
+
+from .session import Session
+from .flow import Flow
+from .serialize import get_class_path
+from .utils import logger
+
+if T.TYPE_CHECKING:
+    from executor.engine import EngineSetting
+    from .node_port import OutputPort
+
+
+# State of the shard process, set by `_init_shard`.
+_shard_state: T.Dict[str, T.Any] = {}
+
+
+def _init_shard(engine_setting: T.Optional["EngineSetting"]):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    _shard_state["loop"] = loop
+    _shard_state["session"] = Session(engine_setting=engine_setting)
+    _shard_state["flows"] = {}
+
+
+def _load_flow(flow_id: str, payload: bytes):
+    from .serialize import flow_from_dict
+    data, node_classes = pickle.loads(payload)
+    flow = flow_from_dict(
+        data, session=_shard_state["session"], node_classes=node_classes)
+    _shard_state["flows"][flow_id] = flow
+
+
+def _run_flow(
+        flow_id: str, inputs: T.List[dict],
+        timeout: T.Optional[float],
+        outputs: T.Optional[T.List[str]]) -> T.List[dict]:
+    flow: Flow = _shard_state["flows"][flow_id]
+    loop: asyncio.AbstractEventLoop = _shard_state["loop"]
+    return loop.run_until_complete(
+        flow.pipeline(inputs, timeout=timeout, outputs=T.cast(
+            T.Optional[T.List[T.Union[str, "OutputPort"]]], outputs)))
+
+
+def _flow_payload(flow: Flow) -> bytes:
+    """Dump the flow and it's node classes, the classes are pickled by
+    value, so the classes defined in local scope can be loaded
+    in the shard process."""
+    import cloudpickle
+    node_classes = {
+        get_class_path(type(node)): type(node)
+        for node in flow.nodes.values()
+    }
+    return cloudpickle.dumps((flow.to_dict(), node_classes))
+
+
+class Shard():
+    """A session running in a separate process, with it's own
+    event loop and engine.
+
+    The requests are executed one by one in the shard process,
+    so the runs of a flow never overlap, use `ShardedSession.pipeline`
+    to execute several inputs of a flow at the same time.
+
+    Args:
+        index: Index of the shard.
+        engine_setting: Setting of the shard's engine.
+    """
+    def __init__(
+            self, index: int,
+            engine_setting: T.Optional["EngineSetting"] = None,
+            ) -> None:
+        self.index = index
+        self.engine_setting = engine_setting
+        # session for building the flows in the driver
+        self.session = Session(engine_setting=engine_setting)
+        self._executor: T.Optional[
+            concurrent.futures.ProcessPoolExecutor] = None
+        self._loaded: T.Set[str] = set()
+        self._pending: T.Set[concurrent.futures.Future] = set()
+
+    def __repr__(self) -> str:
+        return f"<Shard index={self.index}>"
+
+    @property
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        """Start the shard process."""
+        if self.is_running:
+            return
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_shard,
+            initargs=(self.engine_setting,),
+        )
+        self._loaded = set()
+        logger.info(f"{self} started.")
+
+    def stop(self):
+        """Wait the pending requests and stop the shard process."""
+        if not self.is_running:
+            return
+        assert self._executor is not None
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        logger.info(f"{self} stopped.")
+
+    def submit(self, func: T.Callable, *args) -> concurrent.futures.Future:
+        """Call the function in the shard process."""
+        if self._executor is None:
+            raise RuntimeError(f"{self} is not running.")
+        fut = self._executor.submit(func, *args)
+        self._pending.add(fut)
+        fut.add_done_callback(self._pending.discard)
+        return fut
+
+    def run_flow(
+            self, flow: Flow, inputs: T.List[dict],
+            timeout: T.Optional[float] = None,
+            outputs: T.Optional[T.List[str]] = None,
+            ) -> concurrent.futures.Future:
+        """Execute the inputs with `Flow.pipeline` in the shard process.
+        The flow is sent to the shard process on it's first run."""
+        if flow.id not in self._loaded:
+            self.submit(_load_flow, flow.id, _flow_payload(flow))
+            self._loaded.add(flow.id)
+        return self.submit(_run_flow, flow.id, inputs, timeout, outputs)
+
+
+class ShardedSession():
+    """Run independent flows in several processes, to scale
+    the scheduling beyond one event loop and the GIL.
+
+    Each shard is a process with it's own `Session`, event loop and
+    engine. A flow is built in the driver and bound to a shard, it's
+    sent to the shard process on the first run, all it's scheduling
+    (activation, signal passing and validation) runs there.
+    The flow is sent only once, the changes made after the first run
+    are not seen by the shard. The node classes are pickled by value,
+    the classes of the nodes in sub flows or `Map` should be importable.
+    The inputs and outputs are pickled between the processes.
+
+    Args:
+        n_shards: Number of shards, defaults to the number of CPUs.
+        engine_setting: Setting of the engines of the shards.
+    """
+    def __init__(
+            self,
+            n_shards: T.Optional[int] = None,
+            engine_setting: T.Optional["EngineSetting"] = None,
+            ) -> None:
+        if n_shards is None:
+            n_shards = os.cpu_count() or 1
+        self.shards = [Shard(i, engine_setting) for i in range(n_shards)]
+        self._next_shard = itertools.cycle(self.shards)
+        self._flow_to_shard: T.Dict[str, Shard] = {}
+
+    def start(self):
+        for shard in self.shards:
+            shard.start()
+
+    def stop(self):
+        for shard in self.shards:
+            shard.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _pick_shard(self, shard: T.Optional[int]) -> Shard:
+        if shard is None:
+            return next(self._next_shard)
+        return self.shards[shard]
+
+    def new_flow(
+            self, name: T.Optional[str] = None,
+            shard: T.Optional[int] = None) -> Flow:
+        """Create a flow on a shard.
+
+        Args:
+            name: Name of the flow.
+            shard: Index of the shard, if not specified,
+                shards are picked in round-robin.
+        """
+        sd = self._pick_shard(shard)
+        flow = Flow(name=name, session=sd.session)
+        self._flow_to_shard[flow.id] = sd
+        return flow
+
+    def copy_flow(self, flow: Flow, shard: T.Optional[int] = None) -> Flow:
+        """Copy a flow to a shard."""
+        sd = self._pick_shard(shard)
+        new_flow = flow.copy(session=sd.session)
+        self._flow_to_shard[new_flow.id] = sd
+        return new_flow
+
+    def shard_of(self, flow: Flow) -> Shard:
+        """Return the shard of the flow."""
+        try:
+            return self._flow_to_shard[flow.id]
+        except KeyError:
+            raise ValueError(f"{flow} is not created by {self}.")
+
+    def submit(
+            self, flow: Flow, inputs: dict,
+            timeout: T.Optional[float] = None,
+            outputs: T.Optional[T.List[str]] = None,
+            ) -> concurrent.futures.Future:
+        """Execute the flow on it's shard,
+        return a `concurrent.futures.Future` of the result.
+        The requests of a flow are executed one by one."""
+        fut = self.submit_pipeline(flow, [inputs], timeout, outputs)
+        res: concurrent.futures.Future = concurrent.futures.Future()
+
+        def on_done(f: concurrent.futures.Future):
+            e = f.exception()
+            if e is not None:
+                res.set_exception(e)
+            else:
+                res.set_result(f.result()[0])
+
+        fut.add_done_callback(on_done)
+        return res
+
+    def submit_pipeline(
+            self, flow: Flow, inputs: T.List[dict],
+            timeout: T.Optional[float] = None,
+            outputs: T.Optional[T.List[str]] = None,
+            ) -> concurrent.futures.Future:
+        """Execute several inputs of the flow at the same time with
+        `Flow.pipeline` on it's shard, return a
+        `concurrent.futures.Future` of the results."""
+        inputs = list(inputs)
+        for inp in inputs:
+            flow.check_inputs(inp, T.cast(
+                T.Optional[T.List[T.Union[str, "OutputPort"]]], outputs))
+        return self.shard_of(flow).run_flow(flow, inputs, timeout, outputs)
+
+    async def run(
+            self, flow: Flow, inputs: dict,
+            timeout: T.Optional[float] = None,
+            outputs: T.Optional[T.List[str]] = None) -> dict:
+        """Execute the flow on it's shard, can be awaited from any loop."""
+        return await asyncio.wrap_future(
+            self.submit(flow, inputs, timeout, outputs))
+
+    async def pipeline(
+            self, flow: Flow, inputs: T.List[dict],
+            timeout: T.Optional[float] = None,
+            outputs: T.Optional[T.List[str]] = None) -> T.List[dict]:
+        """Execute several inputs of the flow on it's shard,
+        see `Flow.pipeline`."""
+        return await asyncio.wrap_future(
+            self.submit_pipeline(flow, inputs, timeout, outputs))
+
+    def run_sync(
+            self, flow: Flow, inputs: dict,
+            timeout: T.Optional[float] = None) -> dict:
+        """Execute the flow on it's shard and block until done."""
+        return self.submit(flow, inputs).result(timeout=timeout)
+
+    async def join(self, flow: T.Optional[Flow] = None,
+                   timeout: T.Optional[float] = None):
+        """Wait the requests of a flow's shard or all the shards."""
+        if flow is not None:
+            shards = [self.shard_of(flow)]
+        else:
+            shards = self.shards
+        futs = [
+            asyncio.wrap_future(f) for sd in shards for f in list(sd._pending)]
+        if futs:
+            await asyncio.wait(futs, timeout=timeout)
@@ -0,0 +1,166 @@
+import typing as T
+import asyncio
+
+from funcdesc.desc import NotDef
+
+from .node import Node
+from .flow import Flow
+from .utils import cancel_tasks
+from .node_port import (
+    Port, PortLayout, NodePort, ExecPort,
+    InputDataPort, OutputDataPort,
+)
+
+
+def _port_key(port: NodePort) -> str:
+    return f"{port.node.name}.{port.name}"
+
+
+def _port_to_bp(port: NodePort) -> Port:
+    """Create a blueprint from the port of the sub flow."""
+    if isinstance(port, ExecPort):
+        return Port(_port_key(port), exec=True)
+    val_desc = port.val_desc  # type: ignore
+    default = val_desc.default
+    if default is NotDef:
+        default = None
+    bp = Port(
+        _port_key(port), type=val_desc.type,
+        range=val_desc.range, default=default)
+    if isinstance(port, OutputDataPort):
+        bp.save_cache = port.save_cache
+    return bp
+
+
+class FlowNode(Node):
+    """Node that wraps a flow.
+
+    The free input and output ports of the sub flow are mapped to
+    the ports of the node, named in format of `node_name.port_name`.
+    Each FlowNode holds it's own copy of the sub flow, and each running
+    activation executes on a separate copy of it, so the overlapped
+    activations do not share the port caches and the errors.
+    When activated, the sub flow will be executed as a whole,
+    use `FlowNode.inline` or `Flow.inline_subflows` to
+    inline the nodes of sub flow into the parent flow,
+    so they are scheduled directly by the parent flow.
+
+    Args:
+        subflow (Flow | dict): The flow to wrap, or the dict created by
+            `Flow.to_dict`.
+        **kwargs: Other arguments of `Node`.
+    """
+    def __init__(
+            self, subflow: T.Union[Flow, dict],
+            **kwargs) -> None:
+        if isinstance(subflow, dict):
+            self.subflow = Flow.from_dict(subflow)
+        else:
+            self.subflow = subflow.copy(session=subflow.session)
+        self._tasks: T.Set[asyncio.Task] = set()
+        # copies of the sub flow for the activations
+        self._idle_flows: T.List[Flow] = []
+        self._running_flows: T.Set[Flow] = set()
+        super().__init__(**kwargs)
+
+    def __repr__(self) -> str:
+        return f"<FlowNode name={self.name} subflow={self.subflow.name}>"
+
+    def setup_ports(self):
+        self._inner_inputs = self.subflow.free_input_ports
+        self._inner_outputs = self.subflow.free_output_ports
+        self._apply_layout(PortLayout(
+            [_port_to_bp(p) for p in self._inner_inputs],
+            [_port_to_bp(p) for p in self._inner_outputs],
+        ))
+
+    def copy(self, name: T.Optional[str] = None) -> "FlowNode":
+        kwargs = self.get_init_kwargs()
+        kwargs.pop("subflow")
+        if name is not None:
+            kwargs["name"] = name
+        return FlowNode(self.subflow, **kwargs)
+
+    def get_init_kwargs(self) -> T.Dict[str, T.Any]:
+        kwargs = super().get_init_kwargs()
+        kwargs["subflow"] = self.subflow.to_dict()
+        return kwargs
+
+    @property
+    def has_pending_tasks(self) -> bool:
+        return super().has_pending_tasks or (len(self._tasks) > 0)
+
+    @property
+    def is_busy(self) -> bool:
+        return len(self._running_flows) > 0
+
+    async def run(self, *args):
+        inputs = {}
+        data_ports = [
+            p for p in self._inner_inputs if isinstance(p, InputDataPort)]
+        for port, arg in zip(data_ports, args):
+            inputs[_port_key(port)] = arg
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(self._run_subflow(inputs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _acquire_subflow(self) -> Flow:
+        if self._idle_flows:
+            flow = self._idle_flows.pop()
+        else:
+            flow = self.subflow.copy(session=self.subflow.session)
+        self._running_flows.add(flow)
+        return flow
+
+    def _release_subflow(self, flow: Flow):
+        self._running_flows.discard(flow)
+        self._idle_flows.append(flow)
+
+    async def _run_subflow(self, inputs: dict):
+        subflow = self._acquire_subflow()
+        error: T.Optional[Exception] = None
+        try:
+            res = await subflow(inputs)
+        except Exception as e:
+            error = e
+        finally:
+            self._release_subflow(subflow)
+        if error is not None:
+            # same as a failed job of ComputeNode
+            await self.error_callback(error)
+        else:
+            for idx, port in enumerate(self._inner_outputs):
+                await self.set_output(idx, res.get(_port_key(port)))
+        await self._on_job_finished()
+
+    async def cancel(self):
+        await super().cancel()
+        cancel_tasks(self._tasks)
+        for flow in list(self._running_flows):
+            await flow.cancel()
+
+    def inline(self) -> T.Dict[str, Node]:
+        """Inline the sub flow into the parent flow.
+
+        The nodes of the sub flow are copied into the parent flow with
+        names prefixed by `{self.name}.`, the connections of this node
+        are redirected to them, and this node is removed from the flow.
+
+        Returns:
+            Map from the id of the node in sub flow to the new node.
+        """
+        parent = self.flow
+        if parent is None:
+            raise RuntimeError(f"{self} not in a flow.")
+        old2new = self.subflow.copy_into(parent, name_prefix=self.name + ".")
+        for port, inner in zip(self.input_ports, self._inner_inputs):
+            new_in = old2new[inner.node.id].input_ports[inner.index]
+            for pre in list(port.predecessors):
+                pre.connect_with(new_in)
+        for out, inner in zip(self.output_ports, self._inner_outputs):
+            new_out = old2new[inner.node.id].output_ports[inner.index]
+            for suc in list(out.successors):
+                new_out.connect_with(suc)
+        self.flow = None
+        return old2new
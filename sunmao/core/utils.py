@@ -1,3 +1,144 @@
-from executor.engine.utils import CheckAttrRange  # noqa
-from executor.engine.launcher.core import job_type_classes, JOB_TYPES  # noqa
-from loguru import logger  # noqa
+import typing as T
+import gc
+import sys
+import pickle
+import asyncio
+import importlib
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+# The heavy dependencies(executor.engine, loguru) are imported on first use,
+# to keep `import sunmao` fast.
+
+if T.TYPE_CHECKING:
+    from executor.engine.job import Job
+
+
+JOB_TYPES = T.Literal['local', 'thread', 'process', 'dask', 'auto']
+
+
+class CheckAttrRange(object):
+    """Descriptor which checks the value is in the `valid_range`.
+    The check is done by `executor.engine.utils.CheckAttrRange`,
+    imported on first set, so the errors are the same."""
+    valid_range: T.Iterable[T.Any] = []
+    attr = "__"
+
+    def __get__(self, obj, objtype=None):
+        return getattr(obj, self.attr)
+
+    def check(self, obj, value):
+        from executor.engine.utils import CheckAttrRange as _CheckAttrRange
+        _CheckAttrRange.check(self, obj, value)
+
+    def __set__(self, obj, value):
+        self.check(obj, value)
+        setattr(obj, self.attr, value)
+
+
+class _JobTypeClasses(Mapping):
+    """Map from job type to job class, the classes are imported
+    when first accessed."""
+    _paths = {
+        'local': ('executor.engine.job', 'LocalJob'),
+        'thread': ('executor.engine.job', 'ThreadJob'),
+        'process': ('executor.engine.job', 'ProcessJob'),
+        'dask': ('executor.engine.job.dask', 'DaskJob'),
+    }
+    # extras of the optional dependencies
+    _extras = {
+        'dask': 'dask',
+    }
+
+    def __init__(self) -> None:
+        self._classes: T.Dict[str, T.Type["Job"]] = {}
+
+    def __getitem__(self, key: str) -> T.Type["Job"]:
+        if key not in self._classes:
+            mod_name, cls_name = self._paths[key]
+            try:
+                mod = importlib.import_module(mod_name)
+            except ImportError as e:
+                extra = self._extras.get(key)
+                hint = "" if extra is None else \
+                    f", install it with `pip install sunmao-core[{extra}]`"
+                raise ImportError(
+                    f"Job type {key!r} is not available: {e}{hint}"
+                ) from e
+            self._classes[key] = getattr(mod, cls_name)
+        return self._classes[key]
+
+    def __contains__(self, key: object) -> bool:
+        # without importing the job class
+        return key in self._paths
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+job_type_classes = _JobTypeClasses()
+
+
+class _LazyLogger(object):
+    """Proxy of the loguru logger, import loguru on first use."""
+    def __getattr__(self, name: str) -> T.Any:
+        from loguru import logger as _logger
+        return getattr(_logger, name)
+
+
+logger: T.Any = _LazyLogger()
+
+
+_gc_lock = threading.Lock()
+_gc_depth = 0
+_gc_thresholds: T.Tuple[int, ...] = ()
+
+
+@contextmanager
+def gc_paused():
+    """Make the garbage collector run rarely, used when creating lots of
+    objects, which would trigger many useless collections.
+
+    The collector is not disabled, the threshold of the youngest
+    generation is raised. Note the thresholds are process-wide, other
+    threads are affected in the block too, the original thresholds are
+    restored when the last running block exited."""
+    global _gc_depth, _gc_thresholds
+    with _gc_lock:
+        if _gc_depth == 0:
+            _gc_thresholds = gc.get_threshold()
+            th0, *others = _gc_thresholds
+            gc.set_threshold(th0 * 100, *others)
+        _gc_depth += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_depth -= 1
+            if _gc_depth == 0:
+                gc.set_threshold(*_gc_thresholds)
+
+
+def cancel_tasks(tasks: T.Iterable[asyncio.Task]):
+    """Cancel the background tasks, except the current task,
+    the cancel may come from the task itself(on_error="fail_flow")."""
+    current = asyncio.current_task()
+    for task in list(tasks):
+        if task is not current:
+            task.cancel()
+
+
+def payload_size(data: T.Any) -> int:
+    """Size of the data, measured by the length of the pickled bytes."""
+    if data is None:
+        return 0
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    try:
+        return len(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(data)
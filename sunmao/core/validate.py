@@ -0,0 +1,193 @@
+import typing as T
+
+from .node_port import InputDataPort, OutputDataPort, OutputExecPort
+
+if T.TYPE_CHECKING:
+    from .flow import Flow
+    from .node import Node
+    from .node_port import InputPort, OutputPort
+
+
+class FlowValidationError(ValueError):
+    """Raised when the flow can not be executed correctly.
+
+    Attributes:
+        problems (List[str]): Descriptions of the problems.
+    """
+    def __init__(self, flow: "Flow", problems: T.List[str]) -> None:
+        self.problems = problems
+        msg = f"{flow} is invalid:\n" + "\n".join(
+            "  - " + p for p in problems)
+        super().__init__(msg)
+
+
+def _is_subtype(src: T.Any, dst: T.Any) -> bool:
+    if (src is None) or (dst is None):
+        return True
+    try:
+        return issubclass(src, dst)
+    except TypeError:
+        # typing constructs like `List[int]`, can not be checked
+        return True
+
+
+def check_types(flow: "Flow") -> T.List[str]:
+    """Check the types of the connected data ports."""
+    problems = []
+    for conn in flow.connections.values():
+        src, dst = conn.source, conn.target
+        if not isinstance(dst, InputDataPort):
+            continue
+        dst_type = dst.val_desc.type
+        if isinstance(src, OutputExecPort):
+            if dst_type is not None:
+                problems.append(
+                    f"{src} is an exec port, "
+                    f"but {dst} requires {dst_type}.")
+        elif isinstance(src, OutputDataPort):
+            src_type = src.val_desc.type
+            if not _is_subtype(src_type, dst_type):
+                problems.append(
+                    f"Type mismatch: {src} gives {src_type}, "
+                    f"but {dst} requires {dst_type}.")
+    return problems
+
+
+def activatable_nodes(flow: "Flow") -> T.Set["Node"]:
+    """Return the nodes which can be activated when all the free input
+    ports are fed. A port is satisfied if it's free or any of it's
+    predecessors can be activated, an "all"-mode node requires
+    all ports satisfied, an "any"-mode node requires one."""
+    active: T.Set["Node"] = set()
+
+    def satisfied(port: "InputPort") -> bool:
+        if len(port.connections) == 0:
+            return True
+        return any(pre.node in active for pre in port.predecessors)
+
+    changed = True
+    while changed:
+        changed = False
+        for node in flow.nodes.values():
+            if (node in active) or (len(node.input_ports) == 0):
+                continue
+            sat = [satisfied(p) for p in node.input_ports]
+            ok = all(sat) if node.exec_mode == "all" else any(sat)
+            if ok:
+                active.add(node)
+                changed = True
+    return active
+
+
+def find_cycles(flow: "Flow") -> T.List[T.List["Node"]]:
+    """Find the cycles of the flow, return the nodes of each cycle."""
+    from .node import Node
+    succs: T.Dict[Node, T.Set[Node]] = {n: set() for n in flow.nodes.values()}
+    for conn in flow.connections.values():
+        succs[conn.source.node].add(conn.target.node)
+    # Tarjan's strongly connected components, iterative
+    index: T.Dict[Node, int] = {}
+    lowlink: T.Dict[Node, int] = {}
+    on_stack: T.Set[Node] = set()
+    stack: T.List[Node] = []
+    cycles: T.List[T.List[Node]] = []
+    counter = 0
+    for root in succs:
+        if root in index:
+            continue
+        work = [(root, iter(succs[root]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, it = work[-1]
+            for nxt in it:
+                if nxt not in index:
+                    index[nxt] = lowlink[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(succs[nxt])))
+                    break
+                elif nxt in on_stack:
+                    lowlink[node] = min(lowlink[node], index[nxt])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    comp = []
+                    while True:
+                        n = stack.pop()
+                        on_stack.discard(n)
+                        comp.append(n)
+                        if n is node:
+                            break
+                    if (len(comp) > 1) or (node in succs[node]):
+                        cycles.append(comp[::-1])
+    return cycles
+
+
+def validate_flow(
+        flow: "Flow",
+        outputs: T.Optional[T.List["OutputPort"]] = None,
+        prune: bool = False,
+        ) -> T.List["Node"]:
+    """Check the flow before execution.
+
+    Detects cycles without any "any"-mode node(they can never fire),
+    nodes can never be activated(like "all"-mode nodes with an input port
+    fed only by the unreachable nodes), and type mismatches between
+    the connected data ports.
+
+    Args:
+        flow: The flow to check.
+        outputs: The output ports of interest, defaults to
+            the free output data ports.
+        prune: Whether to remove the dead nodes from the flow.
+
+    Returns:
+        The dead nodes, which can not reach any of the outputs.
+
+    Raises:
+        FlowValidationError: If the flow is invalid.
+    """
+    problems: T.List[str] = []
+    for cycle in find_cycles(flow):
+        if all(n.exec_mode == "all" for n in cycle):
+            names = " -> ".join(n.name for n in cycle)
+            problems.append(f"Cycle of 'all'-mode nodes: {names}.")
+    active = activatable_nodes(flow)
+    for node in flow.nodes.values():
+        if node in active:
+            continue
+        if len(node.input_ports) == 0:
+            problems.append(f"{node} has no input ports.")
+            continue
+        if node.exec_mode == "all":
+            unsat = [
+                p.name for p in node.input_ports
+                if (len(p.connections) > 0) and
+                not any(pre.node in active for pre in p.predecessors)
+            ]
+            problems.append(
+                f"{node} can never be activated, input ports "
+                f"{unsat} are not reachable.")
+        else:
+            problems.append(f"{node} can never be activated.")
+    problems.extend(check_types(flow))
+    if problems:
+        raise FlowValidationError(flow, problems)
+    if outputs is None:
+        outputs = [
+            p for p in flow.free_output_ports
+            if isinstance(p, OutputDataPort)
+        ]
+    live = flow.upstream_nodes(outputs)
+    dead = [n for n in flow.nodes.values() if n not in live]
+    if prune:
+        for node in dead:
+            flow.remove_obj(node)
+    return dead
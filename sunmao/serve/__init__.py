@@ -0,0 +1,5 @@
+from .server import FlowServer
+from .client import Client, ServerError
+
+
+__all__ = ["FlowServer", "Client", "ServerError"]
@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+
+from ..core.flow import Flow
+from ..core.session import Session
+from .server import FlowServer
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m sunmao.serve",
+        description="Serve flows over HTTP or an Unix socket.")
+    parser.add_argument(
+        "flows", nargs="+",
+        help="JSON files of the flows, created by `Flow.dump`.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--unix-socket", default=None,
+        help="Path of the Unix socket to listen on.")
+    parser.add_argument(
+        "--no-tcp", action="store_true",
+        help="Only listen on the Unix socket.")
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--batch-wait", type=float, default=0.0)
+    parser.add_argument("--max-queue", type=int, default=1024)
+    return parser
+
+
+async def main(args: argparse.Namespace):
+    session = Session()
+    flows = [Flow.load(path, session=session) for path in args.flows]
+    server = FlowServer(
+        flows, session=session,
+        max_concurrency=args.max_concurrency,
+        batch_size=args.batch_size,
+        batch_wait=args.batch_wait,
+        max_queue=args.max_queue,
+    )
+    async with server:
+        await server.start(
+            host=None if args.no_tcp else args.host,
+            port=args.port,
+            unix_socket=args.unix_socket,
+        )
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(get_parser().parse_args()))
@@ -0,0 +1,94 @@
+import typing as T
+import json
+import socket
+import http.client
+
+
+class ServerError(RuntimeError):
+    """Raised when the server responds with an error.
+
+    Attributes:
+        status (int): The HTTP status code.
+    """
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"[{status}] {message}")
+        self.status = status
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: T.Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            sock.settimeout(self.timeout)
+        sock.connect(self.unix_path)
+        self.sock = sock
+
+
+class Client():
+    """Client of the `FlowServer`.
+
+    Args:
+        host: Host of the server.
+        port: Port of the server.
+        unix_socket: Path of the Unix socket, if given,
+            `host` and `port` are ignored.
+        timeout: Timeout of the connections in seconds.
+    """
+    def __init__(
+            self, host: str = "127.0.0.1", port: int = 8000,
+            unix_socket: T.Optional[str] = None,
+            timeout: T.Optional[float] = None) -> None:
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.timeout = timeout
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.unix_socket is not None:
+            return _UnixHTTPConnection(self.unix_socket, self.timeout)
+        return http.client.HTTPConnection(
+            self.host, self.port, timeout=self.timeout)
+
+    def _request(
+            self, method: str, path: str,
+            body: T.Optional[dict] = None) -> dict:
+        conn = self._connect()
+        try:
+            data = None if body is None else json.dumps(body)
+            headers = {"Content-Type": "application/json"}
+            conn.request(method, path, body=data, headers=headers)
+            resp = conn.getresponse()
+            payload = json.loads(resp.read())
+        finally:
+            conn.close()
+        if resp.status != 200:
+            raise ServerError(resp.status, payload.get("error", ""))
+        return payload
+
+    def call(
+            self, flow: str, inputs: dict,
+            outputs: T.Optional[T.List[str]] = None,
+            timeout: T.Optional[float] = None) -> dict:
+        """Execute a flow on the server.
+
+        Returns:
+            The response, with `outputs`, `errors` and `latency`.
+        """
+        body: T.Dict[str, T.Any] = {"inputs": inputs}
+        if outputs is not None:
+            body["outputs"] = outputs
+        if timeout is not None:
+            body["timeout"] = timeout
+        return self._request("POST", f"/flows/{flow}", body)
+
+    def flows(self) -> dict:
+        """The input and output keys of the flows."""
+        return self._request("GET", "/flows")
+
+    def stats(self) -> dict:
+        """Request counts and latency statistics of the flows."""
+        return self._request("GET", "/stats")
@@ -0,0 +1,327 @@
+import typing as T
+import json
+import time
+import asyncio
+from collections import deque
+from http import HTTPStatus
+
+from ..core.flow import Flow
+from ..core.session import Session
+from ..core.utils import logger
+
+
+class _FlowPool():
+    """Pool of the copies of a flow, each copy runs one request
+    at a time, so the number of copies is the concurrency limit."""
+    def __init__(self, template: Flow, session: Session, size: int) -> None:
+        self.template = template
+        self.session = session
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._n_created = 0
+
+    async def acquire(self) -> Flow:
+        if self._idle.empty() and (self._n_created < self.size):
+            self._n_created += 1
+            return self.template.copy(session=self.session)
+        return await self._idle.get()
+
+    def release(self, flow: Flow):
+        self._idle.put_nowait(flow)
+
+
+class _Stats():
+    def __init__(self, window: int = 1000) -> None:
+        self.n_requests = 0
+        self.n_errors = 0
+        self.latencies: T.Deque[float] = deque(maxlen=window)
+
+    def record(self, latency: float, error: bool = False):
+        self.n_requests += 1
+        if error:
+            self.n_errors += 1
+        self.latencies.append(latency)
+
+    def to_dict(self) -> dict:
+        lat = sorted(self.latencies)
+
+        def percentile(q: float) -> T.Optional[float]:
+            if not lat:
+                return None
+            return lat[min(int(q * len(lat)), len(lat) - 1)]
+
+        return {
+            "requests": self.n_requests,
+            "errors": self.n_errors,
+            "latency_mean": (sum(lat) / len(lat)) if lat else None,
+            "latency_p50": percentile(0.5),
+            "latency_p99": percentile(0.99),
+        }
+
+
+class _Request():
+    def __init__(self, body: dict) -> None:
+        if not isinstance(body, dict):
+            raise TypeError("Request body should be a JSON object.")
+        self.inputs: dict = body.get("inputs", {})
+        self.outputs: T.Optional[T.List[str]] = body.get("outputs")
+        self.timeout: T.Optional[float] = body.get("timeout")
+        self.arrive_time = time.perf_counter()
+        self.future: asyncio.Future = \
+            asyncio.get_running_loop().create_future()
+
+
+class FlowServer():
+    """Serve flows over HTTP or an Unix socket.
+
+    The flows are loaded once and executed in a warm session.
+    Each flow has a pool of copies, requests are queued and
+    dispatched in batches to the idle copies, the requests of a batch
+    run together on one copy with `Flow.pipeline`.
+
+    Endpoints:
+        `POST /flows/{name}`: Execute the flow, the body is a JSON
+            object with `inputs`, and optional `outputs` and `timeout`,
+            same as the arguments of `Flow.__call__`. Responds with
+            `outputs`, `errors` and the `latency`(seconds, including
+            the queueing time).
+        `GET /flows`: List the flows with their input and output keys.
+        `GET /stats`: Request counts and latency statistics.
+
+    Args:
+        flows: The flows to serve, a list of flows(keyed by `Flow.name`)
+            or a dict from name to flow.
+        session: The session to run the flows,
+            defaults to a new session.
+        max_concurrency: Max number of the batches running at the same
+            time for each flow.
+        batch_size: Max number of the requests run together.
+        batch_wait: Time(seconds) to wait for filling a batch.
+        max_queue: Max number of the queued requests of each flow,
+            the requests beyond it are rejected with 503.
+    """
+    def __init__(
+            self,
+            flows: T.Union[T.List[Flow], T.Dict[str, Flow]],
+            session: T.Optional[Session] = None,
+            max_concurrency: int = 4,
+            batch_size: int = 1,
+            batch_wait: float = 0.0,
+            max_queue: int = 1024,
+            ) -> None:
+        if isinstance(flows, list):
+            flows = {flow.name: flow for flow in flows}
+        self.flows = flows
+        self.session = Session() if session is None else session
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_queue = max_queue
+        self.stats = {name: _Stats() for name in flows}
+        self._pools: T.Dict[str, _FlowPool] = {}
+        self._queues: T.Dict[str, asyncio.Queue] = {}
+        self._tasks: T.List[asyncio.Task] = []
+        self._running: T.Set[asyncio.Task] = set()
+        self._servers: T.List[asyncio.Server] = []
+
+    async def start(
+            self, host: T.Optional[str] = "127.0.0.1",
+            port: int = 8000,
+            unix_socket: T.Optional[str] = None):
+        """Start the dispatchers and listen on the address.
+
+        Args:
+            host: Host of the HTTP server, None for not listen on TCP.
+            port: Port of the HTTP server, 0 for a random port.
+            unix_socket: Path of the Unix socket to listen on.
+        """
+        loop = asyncio.get_running_loop()
+        for name, flow in self.flows.items():
+            self._pools[name] = _FlowPool(
+                flow, self.session, self.max_concurrency)
+            self._queues[name] = asyncio.Queue(self.max_queue)
+            self._tasks.append(loop.create_task(self._dispatch(name)))
+        if host is not None:
+            server = await asyncio.start_server(self._handle, host, port)
+            self._servers.append(server)
+            logger.info(f"Serving on http://{host}:{self.port}")
+        if unix_socket is not None:
+            server = await asyncio.start_unix_server(
+                self._handle, unix_socket)
+            self._servers.append(server)
+            logger.info(f"Serving on unix socket {unix_socket}")
+
+    @property
+    def port(self) -> T.Optional[int]:
+        """The port of the TCP server."""
+        for server in self._servers:
+            for sock in server.sockets:
+                addr = sock.getsockname()
+                if isinstance(addr, tuple):
+                    return addr[1]
+        return None
+
+    async def serve_forever(self):
+        await asyncio.gather(*[s.serve_forever() for s in self._servers])
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _dispatch(self, name: str):
+        queue = self._queues[name]
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remain = deadline - loop.time()
+                try:
+                    if remain > 0:
+                        req = await asyncio.wait_for(queue.get(), remain)
+                    else:
+                        req = queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                batch.append(req)
+            # requests of the same outputs and timeout
+            # run together in one pipeline
+            groups: T.Dict[tuple, T.List[_Request]] = {}
+            for req in batch:
+                key = (
+                    req.outputs is None, tuple(req.outputs or ()),
+                    req.timeout)
+                groups.setdefault(key, []).append(req)
+            for reqs in groups.values():
+                flow = await self._pools[name].acquire()
+                task = loop.create_task(self._execute(name, flow, reqs))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+    async def _execute(self, name: str, flow: Flow, reqs: T.List[_Request]):
+        try:
+            res = await flow.pipeline(
+                [req.inputs for req in reqs], timeout=reqs[0].timeout,
+                outputs=reqs[0].outputs, with_errors=True)
+        except Exception as e:
+            for req in reqs:
+                if not req.future.done():
+                    req.future.set_exception(e)
+            return
+        finally:
+            self._pools[name].release(flow)
+        for req, (outputs, errors) in zip(reqs, res):
+            if not req.future.done():
+                req.future.set_result({
+                    "outputs": outputs,
+                    "errors": [[node.name, repr(e)] for node, e in errors],
+                })
+
+    async def submit(self, name: str, body: dict) -> dict:
+        """Queue a request of the flow and wait for the response."""
+        if name not in self.flows:
+            raise KeyError(f"No flow named {name}.")
+        req = _Request(body)
+        error = False
+        try:
+            # reject the bad request here, not fail the whole batch
+            self.flows[name].check_inputs(req.inputs, req.outputs)
+            self._queues[name].put_nowait(req)
+            resp = await req.future
+        except Exception:
+            error = True
+            raise
+        finally:
+            latency = time.perf_counter() - req.arrive_time
+            self.stats[name].record(latency, error)
+        resp["latency"] = latency
+        return resp
+
+    def describe(self) -> dict:
+        """The input and output keys of the flows."""
+        info = {}
+        for name, flow in self.flows.items():
+            info[name] = {
+                "inputs": [
+                    f"{p.node.name}.{p.name}" for p in flow.free_input_ports],
+                "outputs": [
+                    f"{p.node.name}.{p.name}"
+                    for p in flow.free_output_ports],
+            }
+        return info
+
+    async def _route(
+            self, method: str, path: str,
+            body: bytes) -> T.Tuple[HTTPStatus, dict]:
+        if (method == "GET") and (path == "/flows"):
+            return HTTPStatus.OK, self.describe()
+        if (method == "GET") and (path == "/stats"):
+            return HTTPStatus.OK, {
+                name: s.to_dict() for name, s in self.stats.items()}
+        if (method == "POST") and path.startswith("/flows/"):
+            name = path[len("/flows/"):]
+            if name not in self.flows:
+                return HTTPStatus.NOT_FOUND, {
+                    "error": f"No flow named {name}."}
+            try:
+                req_body = json.loads(body or b"{}")
+            except ValueError as e:
+                return HTTPStatus.BAD_REQUEST, {"error": repr(e)}
+            try:
+                resp = await self.submit(name, req_body)
+            except asyncio.QueueFull:
+                return HTTPStatus.SERVICE_UNAVAILABLE, {
+                    "error": f"Too many requests of {name}."}
+            except (ValueError, KeyError, TypeError) as e:
+                return HTTPStatus.BAD_REQUEST, {"error": repr(e)}
+            except Exception as e:
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(e)}
+            return HTTPStatus.OK, resp
+        return HTTPStatus.NOT_FOUND, {"error": f"{method} {path} not found."}
+
+    async def _handle(
+            self, reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            method, path, _ = line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                h = await reader.readline()
+                if h in (b"\r\n", b"\n", b""):
+                    break
+                key, _, val = h.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = val.strip()
+            length = int(headers.get("content-length", 0))
+            body = (await reader.readexactly(length)) if length else b""
+            status, payload = await self._route(method, path, body)
+            try:
+                data = json.dumps(payload).encode()
+            except TypeError as e:
+                status = HTTPStatus.INTERNAL_SERVER_ERROR
+                data = json.dumps({"error": repr(e)}).encode()
+            head = (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n"
+            )
+            writer.write(head.encode("latin-1") + data)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logger.warning(f"Connection error: {repr(e)}")
+        finally:
+            writer.close()
@@ -1,3 +1,8 @@
+import sys
+import time
+import json
+import subprocess
+
 import pytest
 from sunmao.api import compute, Session, Flow
 from funcdesc import mark_input, mark_output
@@ -95,3 +100,183 @@ async def test_compute_node_output_cache():
         await inc(0)
         await flow.session.join()
         assert inc.O[0].cache is None
+
+
+@compute
+def Inc(a: int) -> int:
+    return a + 1
+
+
+@pytest.mark.asyncio
+async def test_flow_dump_load(tmp_path):
+    with Flow() as flow:
+        inc1 = Inc(name="inc1")
+        inc2 = Inc(name="inc2")
+        inc1 >> inc2
+    path = str(tmp_path / "flow.json")
+    flow.dump(path)
+    flow2 = Flow.load(path)
+    assert flow2.name == flow.name
+    res = await flow2({"inc1.a": 1})
+    assert res == {"inc2.output_0": 3}
+
+
+@pytest.mark.asyncio
+async def test_async_compute_node():
+    import asyncio
+    import threading
+
+    @compute
+    async def AsyncInc(a: int) -> int:
+        await asyncio.sleep(0.1)
+        assert threading.current_thread() is threading.main_thread()
+        return a + 1
+
+    with Flow() as flow:
+        incs = [AsyncInc(name=f"inc{i}") for i in range(20)]
+        add = AsyncInc(name="last")
+        incs[0] >> add
+    inputs = {f"inc{i}.a": i for i in range(1, 20)}
+    inputs["inc0.a"] = 0
+    res = await flow(inputs)
+    assert res["last.output_0"] == 2
+    assert res["inc19.output_0"] == 20
+
+
+@pytest.mark.asyncio
+async def test_debounce_and_max_rate():
+    import asyncio
+    runs = []
+
+    @compute(default_job_type="local", default_debounce=0.1)
+    def Debounced(a: int) -> int:
+        runs.append(a)
+        return a
+
+    @compute(default_job_type="local", default_max_rate=10)
+    def Limited(a: int) -> int:
+        runs.append(a)
+        return a
+
+    with Flow() as flow:
+        deb = Debounced()
+        lim = Limited()
+        lim2 = Limited(max_rate=0)
+    assert deb.debounce == 0.1
+    for i in range(5):
+        deb.I[0].put_signal(data=i)
+        await deb.activate()
+        await asyncio.sleep(0.01)
+    assert runs == []
+    await flow.join()
+    assert runs == [4]
+
+    runs.clear()
+    for i in range(5):
+        lim.I[0].put_signal(data=i)
+        await lim.activate()
+    await asyncio.sleep(0.03)
+    assert runs == [0]
+    await flow.join()
+    assert runs == [0, 4]
+
+    runs.clear()
+    for i in range(3):
+        lim2.I[0].put_signal(data=i)
+        await lim2.activate()
+    await flow.join()
+    assert runs == [0, 1, 2]
+
+
+def test_import_time():
+    code = (
+        "import sys, time, json\n"
+        "t = time.perf_counter()\n"
+        "import sunmao.api\n"
+        "elapsed = time.perf_counter() - t\n"
+        "heavy = [m for m in ('executor', 'loguru', 'dask')"
+        " if m in sys.modules]\n"
+        "print(json.dumps([elapsed, heavy]))\n"
+    )
+    out = subprocess.check_output([sys.executable, "-c", code], text=True)
+    elapsed, heavy = json.loads(out)
+    print(f"import sunmao.api: {elapsed * 1000:.1f}ms")
+    # heavy dependencies are imported on first use
+    assert heavy == []
+    assert elapsed < 2.0
+
+
+@pytest.mark.asyncio
+async def test_serve(tmp_path):
+    import asyncio
+    from sunmao.serve import FlowServer, Client, ServerError
+
+    @compute
+    def Add(a: int, b: int) -> int:
+        return a + b
+
+    @compute
+    def Square(a: int) -> int:
+        return a ** 2
+
+    @compute
+    def Nap(a: float) -> float:
+        time.sleep(a)
+        return a
+
+    sess = Session()
+    flow = Flow(name="add_square", session=sess)
+    with flow:
+        add = Add(name="add", job_type="local")
+        sq = Square(name="sq", job_type="local")
+        add >> sq
+    nap_flow = Flow(name="nap", session=sess)
+    with nap_flow:
+        Nap(name="nap", job_type="thread")
+    sock = str(tmp_path / "sunmao.sock")
+    server = FlowServer(
+        [flow, nap_flow], session=sess, max_concurrency=2,
+        batch_size=4, batch_wait=0.01)
+    loop = asyncio.get_running_loop()
+
+    def in_thread(func, *args):
+        return loop.run_in_executor(None, func, *args)
+
+    async with server:
+        await server.start(port=0, unix_socket=sock)
+        client = Client(port=server.port)
+        info = await in_thread(client.flows)
+        assert info["add_square"]["outputs"] == ["sq.output_0"]
+        resps = await asyncio.gather(*[
+            in_thread(client.call, "add_square", {"add.a": i, "add.b": 1})
+            for i in range(6)
+        ])
+        assert [r["outputs"]["sq.output_0"] for r in resps] == \
+            [(i + 1) ** 2 for i in range(6)]
+        assert all(r["latency"] > 0 for r in resps)
+        # at most 2 copies of the flow are created
+        assert server._pools["add_square"]._n_created <= 2
+        unix_client = Client(unix_socket=sock)
+        resp = await in_thread(
+            unix_client.call, "add_square", {"add.a": 1, "add.b": 1})
+        assert resp["outputs"] == {"sq.output_0": 4}
+        with pytest.raises(ServerError) as e:
+            await in_thread(client.call, "xxx", {})
+        assert e.value.status == 404
+        with pytest.raises(ServerError) as e:
+            await in_thread(client.call, "add_square", {})
+        assert e.value.status == 400
+        status, _ = await server._route(
+            "POST", "/flows/add_square", b"[1, 2]")
+        assert status == 400
+        stats = await in_thread(client.stats)
+        assert stats["add_square"]["requests"] == 8
+        assert stats["add_square"]["errors"] == 1
+        # the timeout only applies to the request which sets it
+        timed, untimed = await asyncio.gather(
+            server.submit(
+                "nap", {"inputs": {"nap.a": 0.3}, "timeout": 0.05}),
+            server.submit("nap", {"inputs": {"nap.a": 0.3}}),
+            return_exceptions=True)
+        assert isinstance(timed, TimeoutError)
+        assert untimed["outputs"] == {"nap.output_0": 0.3}
@@ -1,6 +1,8 @@
 import typing as T
 import pytest
+import os
 import time
+import hashlib
 import asyncio
 
 from sunmao.core.node import ComputeNode
@@ -105,9 +107,14 @@ async def test_one_node_run(node_defs):
     Add: T.Type[ComputeNode] = node_defs['add']
     with Flow():
         add: ComputeNode = Add(job_type='local')
+    # the job states are created on the first submit
+    assert "inflight_args" not in add.__dict__
+    assert not add.is_busy
     job = await add(1, 2)
     await job.join()
     assert job.result() == 3
+    assert add.inflight_args == {}
+    assert ComputeNode.inflight_args == {}
     with pytest.raises(TypeError):
         await add(1.0, 2)
     with pytest.raises(ValueError):
@@ -225,6 +232,18 @@ def test_attr_range(node_defs):
         sq1.job_type = "aaa"
 
 
+def test_job_type_classes(monkeypatch):
+    import sys
+    from sunmao.core.utils import _JobTypeClasses
+    classes = _JobTypeClasses()
+    monkeypatch.setitem(sys.modules, "executor.engine.job.dask", None)
+    assert "dask" in classes
+    with pytest.raises(ImportError, match=r"sunmao-core\[dask\]"):
+        classes["dask"]
+    with pytest.raises(KeyError):
+        classes["aaa"]
+
+
 def test_node_name(node_defs):
     with Flow() as flow:
         Add = node_defs['add']
@@ -322,3 +341,1006 @@ async def test_port_callback(node_defs):
         out_port.register_callback(assert_res)
         await add(1, 2)
         await flow.session.join()
+
+
+def test_port_layout_shared(node_defs):
+    Add = node_defs['add']
+    AddDefault = node_defs['add_with_default']
+    add1: ComputeNode = Add()
+    add2: ComputeNode = Add()
+    assert add1.port_layout is add2.port_layout
+    assert add1.input_ports[0] is not add2.input_ports[0]
+    assert add1.input_ports[0].val_desc is add2.input_ports[0].val_desc
+    assert add1.output_ports[0].val_desc is add2.output_ports[0].val_desc
+    add3: ComputeNode = AddDefault()
+    assert add3.port_layout is not add1.port_layout
+    assert add3._get_call_args(1) == [1, 10]
+    assert add3._get_call_args(b=2) == [None, 2]
+
+
+@pytest.mark.asyncio
+async def test_flow_dump_load(node_defs, tmp_path):
+    from sunmao.core.serialize import get_class_path
+    Add = node_defs['add']
+    Square = node_defs['square']
+    with Flow() as flow:
+        add1: ComputeNode = Add(name="add1", job_type="local")
+        sq1: ComputeNode = Square(name="sq1", exec_mode="any")
+        sq2: ComputeNode = Square(name="sq2")
+        sq1.connect_with(add1, 0, 0)
+        sq2.connect_with(add1, 0, 1)
+    await flow({"sq1.a": 1, "sq2.a": 2})
+    path = str(tmp_path / "flow.json")
+    flow.dump(path, with_caches=True)
+    with pytest.raises(ValueError):
+        Flow.load(path)
+    node_classes = {get_class_path(c): c for c in (Add, Square)}
+    flow2 = Flow.load(path, node_classes=node_classes)
+    assert len(flow2.nodes) == 3
+    assert len(flow2.connections) == 2
+    nodes = {n.name: n for n in flow2.nodes.values()}
+    assert nodes["add1"].job_type == "local"
+    assert nodes["sq1"].exec_mode == "any"
+    assert nodes["add1"].output_ports[0].cache == 5
+    res = await flow2({"sq1.a": 2, "sq2.a": 3})
+    assert res == {'add1.res': 13}
+    data = flow2.to_dict()
+    data["version"] = -1
+    with pytest.raises(ValueError):
+        Flow.from_dict(data, node_classes=node_classes)
+
+    # the attributes not in JSON are pickled
+    from datetime import date
+    sq2.attrs["since"] = date(2020, 1, 1)
+    flow.dump(path)
+    flow2 = Flow.load(path, node_classes=node_classes)
+    assert flow2.get_node("sq2").attrs["since"] == date(2020, 1, 1)
+    sq2.attrs["since"] = lambda: None
+    with pytest.raises(TypeError, match="since"):
+        flow.dump(path)
+
+
+@pytest.mark.asyncio
+async def test_flow_checkpoint(node_defs, tmp_path):
+    from sunmao.core.serialize import get_class_path
+    Add = node_defs['add']
+    Square = node_defs['square']
+    SleepSquare = node_defs['sleep_square']
+    node_classes = {
+        get_class_path(c): c for c in (Add, Square, SleepSquare)}
+    with Flow() as flow:
+        sq1: ComputeNode = Square(name="sq1", job_type="local")
+        ssq: ComputeNode = SleepSquare(name="ssq")
+        add: ComputeNode = Add(name="add", job_type="local")
+        sq1.connect_with(ssq, 0, 0)
+        ssq.connect_with(add, 0, 0)
+    await sq1(2)
+    await asyncio.sleep(0.1)
+    assert len(ssq.inflight_args) == 1
+    async with flow.checkpointer(tmp_path, interval=0.05):
+        await asyncio.sleep(0.1)
+    await flow.join()
+    assert add.output_ports[0].cache is None
+
+    flow2 = Flow.load_checkpoint(tmp_path, node_classes=node_classes)
+    nodes = {n.name: n for n in flow2.nodes.values()}
+    assert nodes["sq1"].output_ports[0].cache == 4
+    await flow2.resume()
+    assert nodes["ssq"].output_ports[0].cache == 16
+    assert len(nodes["add"].input_ports[0].signal_buffer) == 1
+    flow2.save_checkpoint(tmp_path)
+    flow3 = Flow.load_checkpoint(tmp_path, node_classes=node_classes)
+    nodes = {n.name: n for n in flow3.nodes.values()}
+    assert len(nodes["add"].input_ports[0].signal_buffer) == 1
+    nodes["add"].input_ports[1].put_signal(data=1)
+    await flow3.resume()
+    assert nodes["add"].output_ports[0].cache == 17
+
+
+@pytest.mark.asyncio
+async def test_checkpointer_errors(node_defs, tmp_path, monkeypatch):
+    from sunmao.core import checkpoint
+    from sunmao.core.remote import RemoteRef
+    from sunmao.core.serialize import get_class_path
+    Square = node_defs['square']
+    with Flow() as flow:
+        sq1: ComputeNode = Square(name="sq1", job_type="local")
+        sq2: ComputeNode = Square(name="sq2", job_type="local")
+    fut = asyncio.get_running_loop().create_future()
+    fut.set_result(3)
+    sq1.output_ports[0].cache = RemoteRef(fut)  # type: ignore
+    sq2.input_ports[0].put_signal(data=RemoteRef(fut))
+    # the data kept remotely is skipped or fetched, not pickled
+    flow.save_checkpoint(tmp_path)
+    node_classes = {get_class_path(Square): Square}
+    flow2 = Flow.load_checkpoint(tmp_path, node_classes=node_classes)
+    assert flow2.get_node("sq1").output_ports[0].cache is None
+    assert len(flow2.get_node("sq2").input_ports[0].signal_buffer) == 0
+    await flow.checkpointer(tmp_path).save_async()
+    flow2 = Flow.load_checkpoint(tmp_path, node_classes=node_classes)
+    assert flow2.get_node("sq1").output_ports[0].cache == 3
+    assert flow2.get_node("sq2").input_ports[0].signal_buffer[0].data == 3
+
+    # the loop keeps running after a failed save
+    calls = []
+    orig = checkpoint.save_checkpoint
+
+    def flaky_save(*args):
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return orig(*args)
+
+    monkeypatch.setattr(checkpoint, "save_checkpoint", flaky_save)
+    ckpt = flow.checkpointer(tmp_path, interval=0.02)
+    ckpt.start()
+    await asyncio.sleep(0.1)
+    ckpt.stop(save=False)
+    assert len(calls) > 1
+
+
+@pytest.mark.asyncio
+async def test_dask_remote_data():
+    distributed = pytest.importorskip("distributed")
+    from sunmao.core.remote import RemoteRef
+
+    class Split(ComputeNode):
+        init_input_ports = [Port("a", type=int)]
+        init_output_ports = [Port("x", type=int), Port("y", type=int)]
+
+        @staticmethod
+        def func(a):
+            return a, a + 1
+
+    class Mul(ComputeNode):
+        init_input_ports = [Port("x", type=int), Port("y", type=int)]
+        init_output_ports = [Port("res", type=int)]
+
+        @staticmethod
+        def func(x, y):
+            return x * y
+
+    cluster = await distributed.LocalCluster(
+        processes=False, asynchronous=True, dashboard_address=None)
+    client = await distributed.Client(cluster, asynchronous=True)
+    try:
+        with Session() as sess:
+            sess.engine.dask_client = client
+            with Flow() as flow:
+                split = Split(job_type="dask", remote_data=True)
+                mul1 = Mul(job_type="dask", remote_data=True)
+                mul2 = Mul(job_type="local")
+                split.connect_with(mul1, 0, 0)
+                split.connect_with(mul1, 1, 1)
+                mul1.connect_with(mul2, 0, 0)
+                split.connect_with(mul2, 1, 1)
+            res = await flow({"a": 2})
+            assert res == {f"{mul2.name}.res": 18}
+            assert isinstance(split.output_ports[0].cache, RemoteRef)
+            assert isinstance(mul1.output_ports[0].cache, RemoteRef)
+            assert await mul1.output_ports[0].fetch_cache() == 6
+            assert mul2.output_ports[0].cache == 18
+    finally:
+        await client.close()
+        await cluster.close()
+
+
+def test_sessions_in_threads(node_defs):
+    from concurrent.futures import ThreadPoolExecutor
+    Square = node_defs['square']
+
+    def run_in_thread(x):
+        async def main():
+            with Session() as sess:
+                with Flow() as flow:
+                    sq1: ComputeNode = Square(name="sq1")
+                    sq2: ComputeNode = Square(name="sq2")
+                    sq1.connect_with(sq2, 0, 0)
+                res = await flow({"a": x})
+                assert Session.get_current() is sess
+                return sess, res
+        return asyncio.run(main())
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(run_in_thread, range(8)))
+    sessions = {id(sess) for sess, _ in results}
+    assert len(sessions) == 8
+    assert [res["sq2.res"] for _, res in results] == \
+        [x ** 4 for x in range(8)]
+
+
+@pytest.mark.asyncio
+async def test_default_session_shared():
+    from concurrent.futures import ThreadPoolExecutor
+
+    async def in_task():
+        return Session.get_current()
+
+    default = await asyncio.get_running_loop().create_task(in_task())
+    assert Session.get_current() is default
+    with ThreadPoolExecutor(1) as pool:
+        assert pool.submit(Session.get_current).result() is default
+
+    sess = Session()
+
+    async def enter_twice(delay):
+        with sess:
+            await asyncio.sleep(delay)
+            assert Session.get_current() is sess
+        return Session.get_current()
+
+    res = await asyncio.gather(enter_twice(0.05), enter_twice(0.01))
+    assert res == [default, default]
+    assert Session.get_current() is default
+
+@pytest.mark.asyncio
+async def test_sharded_session(node_defs):
+    from sunmao.core.shard import ShardedSession
+    Square = node_defs['square']
+    with ShardedSession(n_shards=2) as sharded:
+        flow = sharded.new_flow(shard=0)
+        with flow:
+            sq1: ComputeNode = Square(name="sq1", job_type="local")
+            sq2: ComputeNode = Square(name="sq2", job_type="local")
+            sq1.connect_with(sq2, 0, 0)
+        assert sq1.flow is flow
+        flows = [flow] + [sharded.copy_flow(flow) for _ in range(3)]
+        assert sharded.shard_of(flows[1]).index == 0
+        assert sharded.shard_of(flows[2]).index == 1
+        res = await asyncio.gather(*[
+            sharded.run(f, {"a": i}) for i, f in enumerate(flows)
+        ])
+        assert res == [{"sq2.res": i ** 4} for i in range(4)]
+        assert sharded.run_sync(flows[3], {"a": 2}) == {"sq2.res": 16}
+        # overlapping runs of a flow get their own results
+        futs = [sharded.submit(flows[0], {"a": i}) for i in range(3)]
+        assert [f.result() for f in futs] == [
+            {"sq2.res": i ** 4} for i in range(3)]
+        res = await sharded.pipeline(flows[1], [{"a": i} for i in range(3)])
+        assert res == [{"sq2.res": i ** 4} for i in range(3)]
+        await sharded.join(flows[0])
+        await sharded.join()
+        with pytest.raises(ValueError):
+            sharded.shard_of(Flow())
+    shard = sharded.shard_of(flows[0])
+    assert not shard.is_running
+    with pytest.raises(RuntimeError):
+        shard.run_flow(flows[0], [{"a": 2}])
+    # restart with a new process, the flow is sent again
+    shard.start()
+    assert shard.run_flow(flows[0], [{"a": 2}]).result() == [{"sq2.res": 16}]
+    shard.stop()
+
+
+@pytest.mark.asyncio
+async def test_coalesce_any_mode():
+    class Record(ComputeNode):
+        init_input_ports = [Port("a"), Port("b", default=0)]
+        init_output_ports = [Port("res")]
+        runs: T.List[T.Any] = []
+
+        @classmethod
+        def func(cls, a, b):
+            time.sleep(0.3)
+            cls.runs.append((a, b))
+            return a
+
+    for coalesce, n_runs in ((True, 2), (False, 6)):
+        Record.runs = []
+        with Flow() as flow:
+            rec = Record(exec_mode="any", coalesce=coalesce)
+        for i in range(5):
+            rec.input_ports[0].put_signal(data=i)
+            await rec.activate()
+        rec.input_ports[1].put_signal(data=10)
+        await rec.activate()
+        await flow.join()
+        await asyncio.sleep(0.05)
+        await flow.join()
+        assert len(Record.runs) == n_runs
+        if coalesce:
+            assert Record.runs == [(0, 0), (4, 10)]
+
+
+@pytest.mark.asyncio
+async def test_timeout_and_cancel(node_defs):
+    SleepSquare = node_defs['sleep_square']
+    Square = node_defs['square']
+    with Flow() as flow:
+        ssq: ComputeNode = SleepSquare(name="ssq", timeout=0.1)
+        sq: ComputeNode = Square(name="sq", job_type="local")
+        ssq.connect_with(sq, 0, 0)
+    t0 = time.time()
+    res = await flow({"a": 2})
+    assert time.time() - t0 < 0.4
+    assert res == {"sq.res": None}
+    assert not flow.is_running
+    job = flow.session.engine.jobs.get_job_by_id(ssq.jobs_id[-1])
+    assert job.status == "cancelled"
+
+    ssq.timeout = None
+    t0 = time.time()
+    with pytest.raises(TimeoutError):
+        await flow({"a": 3}, timeout=0.1)
+    assert time.time() - t0 < 0.4
+    assert not flow.is_running
+    await asyncio.sleep(0.6)
+    assert sq.output_ports[0].cache is None
+    res = await flow({"a": 2})
+    assert res == {"sq.res": 16}
+
+
+@pytest.mark.asyncio
+async def test_retry_and_on_error():
+    class Flaky(ComputeNode):
+        init_input_ports = [Port("a", type=int)]
+        init_output_ports = [Port("res", type=int, default=-1)]
+        n_calls = 0
+
+        @classmethod
+        def func(cls, a):
+            cls.n_calls += 1
+            if cls.n_calls <= 2:
+                raise RuntimeError("flaky")
+            return a
+
+    class Inc(ComputeNode):
+        init_input_ports = [Port("a", type=int)]
+        init_output_ports = [Port("res", type=int)]
+
+        @staticmethod
+        def func(a):
+            return a + 1
+
+    with Flow() as flow:
+        flaky: ComputeNode = Flaky(
+            name="flaky", job_type="local", retries=2, backoff=0.01)
+        inc: ComputeNode = Inc(name="inc", job_type="local")
+        flaky.connect_with(inc, 0, 0)
+    assert await flow({"a": 1}) == {"inc.res": 2}
+    assert Flaky.n_calls == 3
+    assert flow.errors == []
+
+    # the failed job finishes during the backoff
+    Flaky.n_calls = 1
+    flaky.backoff = 0.3
+    task = asyncio.get_running_loop().create_task(flow({"a": 2}))
+    await asyncio.sleep(0.1)
+    job = flow.session.engine.jobs.get_job_by_id(flaky.jobs_id[-1])
+    assert job.status == "failed"
+    assert flow.is_running
+    assert await task == {"inc.res": 3}
+    flaky.backoff = 0.01
+
+    Flaky.n_calls = 0
+    flaky.retries = 0
+    # the value of the previous call is not returned
+    assert inc.output_ports[0].cache == 3
+    assert await flow({"a": 1}) == {"inc.res": None}
+    assert len(flow.errors) == 1
+    assert flow.errors[0][0] is flaky
+
+    Flaky.n_calls = 0
+    flaky.on_error = "default"
+    assert await flow({"a": 1}) == {"inc.res": 0}
+
+    Flaky.n_calls = 0
+    flaky.on_error = "fail_flow"
+    with pytest.raises(RuntimeError):
+        await flow({"a": 1})
+
+
+@pytest.mark.asyncio
+async def test_flow_call_outputs(node_defs):
+    Add = node_defs['add']
+    Square = node_defs['square']
+    with Flow() as flow:
+        sq1: ComputeNode = Square(name="sq1", job_type="local")
+        sq2: ComputeNode = Square(name="sq2", job_type="local")
+        sq3: ComputeNode = Square(name="sq3", job_type="local")
+        add1: ComputeNode = Add(name="add1", job_type="local")
+        sq4: ComputeNode = Square(name="sq4", job_type="local")
+        sq1.connect_with(add1, 0, 0)
+        sq2.connect_with(add1, 0, 1)
+        sq1.connect_with(sq3, 0, 0)
+    assert flow.upstream_nodes([add1.output_ports[0]]) == {add1, sq1, sq2}
+    res = await flow({"sq1.a": 1, "sq2.a": 2}, outputs=["add1.res"])
+    assert res == {"add1.res": 5}
+    assert len(sq3.jobs_id) == 0
+    assert len(sq4.jobs_id) == 0
+    res = await flow({"sq1.a": 2}, outputs=[sq3.output_ports[0]])
+    assert res == {"sq3.res": 16}
+    assert len(sq2.jobs_id) == 1
+    with pytest.raises(KeyError):
+        await flow({}, outputs=["add1.xxx"])
+    # overlapping calls with different outputs
+    SleepSquare = node_defs['sleep_square']
+    with Flow() as flow2:
+        ssq: ComputeNode = SleepSquare(name="ssq")
+        sq5: ComputeNode = Square(name="sq5", job_type="local")
+        Square(name="sq6", job_type="local")
+        ssq.connect_with(sq5, 0, 0)
+    res = await asyncio.gather(
+        flow2({"ssq.a": 2}, outputs=["sq5.res"]),
+        flow2({"sq6.a": 3}, outputs=["sq6.res"]))
+    assert res == [{"sq5.res": 16}, {"sq6.res": 9}]
+    assert flow2._run_cones == {}
+
+
+@pytest.mark.asyncio
+async def test_flow_node(node_defs):
+    from sunmao.core.subflow import FlowNode
+    Add = node_defs['add']
+    Square = node_defs['square']
+    with Flow() as sub:
+        sq1: ComputeNode = Square(name="sq1", job_type="local")
+        sq2: ComputeNode = Square(name="sq2", job_type="local")
+        sq1.connect_with(sq2, 0, 0)
+    with Flow() as flow:
+        add: ComputeNode = Add(name="add", job_type="local")
+        fn = FlowNode(sub, name="fn")
+        add.connect_with(fn, 0, 0)
+    assert [p.name for p in fn.input_ports] == ["sq1.a"]
+    assert [p.name for p in fn.output_ports] == ["sq2.res"]
+    res = await flow({"add.a": 1, "add.b": 1})
+    assert res == {"fn.sq2.res": 16}
+    assert len(sq1.jobs_id) == 0  # template flow is not executed
+    fn2 = fn.copy()
+    assert fn2.subflow is not fn.subflow
+    flow.remove_obj(fn2)
+    flow.inline_subflows()
+    assert fn.flow is None
+    assert {n.name for n in flow.nodes.values()} == \
+        {"add", "fn.sq1", "fn.sq2"}
+    res = await flow({"add.a": 1, "add.b": 1})
+    assert res == {"fn.sq2.res": 16}
+
+
+@pytest.mark.asyncio
+async def test_flow_node_concurrent(node_defs):
+    from sunmao.core.subflow import FlowNode
+    SleepSquare = node_defs['sleep_square']
+    with Flow() as sub:
+        sq: ComputeNode = SleepSquare(name="sq", job_type="thread")
+    with Flow() as flow:
+        fn = FlowNode(sub, name="fn")
+    # each activation runs on its own copy of the subflow
+    res = await flow.pipeline([{"fn.sq.a": 2}, {"fn.sq.a": 3}])
+    assert res == [{"fn.sq.res": 4}, {"fn.sq.res": 9}]
+    assert len(sq.jobs_id) == 0
+    assert not fn.is_busy
+
+
+    class Fail(ComputeNode):
+        init_input_ports = [Port("a")]
+        init_output_ports = [Port("res")]
+
+        @staticmethod
+        def func(a):
+            raise RuntimeError("fail")
+
+    with Flow() as sub:
+        Fail(name="fail", job_type="local", on_error="fail_flow")
+    with Flow() as flow:
+        fn = FlowNode(sub, name="fn", on_error="fail_flow")
+    with pytest.raises(RuntimeError):
+        await flow({"fn.fail.a": 1})
+    assert not fn.is_busy
+
+
+@pytest.mark.asyncio
+async def test_map_node(node_defs):
+    from sunmao.core.map_node import Map
+    Add = node_defs['add']
+    Square = node_defs['square']
+    with Flow() as flow:
+        m_sq = Map(Square, name="m_sq", chunk_size=2, max_inflight=2)
+        m_add = Map(Add, name="m_add", job_type="local")
+        m_sq.connect_with(m_add, 0, 0)
+    assert m_sq.job_type == "thread"
+    res = await flow({"m_sq.a": range(5), "m_add.b": [1] * 5})
+    assert res == {"m_add.res": [1, 2, 5, 10, 17]}
+    assert len(m_sq.jobs_id) == 3
+    assert len(m_add.jobs_id) == 5
+    res = await flow({"m_sq.a": [], "m_add.b": []})
+    assert res == {"m_add.res": []}
+    m2 = m_sq.copy(name="m2")
+    assert m2.chunk_size == 2
+    assert m2.node_cls is Square
+
+    class Flaky(ComputeNode):
+        init_input_ports = [Port("a")]
+        init_output_ports = [Port("res")]
+        default_retries = 1
+        default_on_error = "fail_flow"
+        n_calls = 0
+        n_running = 0
+        max_running = 0
+
+        @staticmethod
+        def func(a):
+            cls = Flaky
+            cls.n_calls += 1
+            n_calls = cls.n_calls
+            cls.n_running += 1
+            cls.max_running = max(cls.max_running, cls.n_running)
+            time.sleep(0.05)
+            cls.n_running -= 1
+            if n_calls == 1:
+                raise RuntimeError("flaky")
+            return a
+
+    with Flow() as flow:
+        m_fl = Map(Flaky, name="m_fl", job_type="local", max_inflight=2)
+    assert (m_fl.retries, m_fl.on_error) == (1, "fail_flow")
+    # the chunks are produced lazily from the iterator
+    res = await flow({"m_fl.a": iter(range(6))})
+    assert res == {"m_fl.res": list(range(6))}
+    assert Flaky.n_calls == 7
+    m_fl.job_type = "thread"
+    res = await flow({"m_fl.a": iter(range(6))})
+    assert res == {"m_fl.res": list(range(6))}
+    assert Flaky.max_running == 2
+    Flaky.n_calls = 0
+    m_fl.retries = 0
+    with pytest.raises(RuntimeError):
+        await flow({"m_fl.a": range(6)})
+    assert not m_fl.is_busy
+
+
+@pytest.mark.asyncio
+async def test_flow_validate(node_defs):
+    from sunmao.core.validate import FlowValidationError
+    Add = node_defs['add']
+    Square = node_defs['square']
+
+    class StrNode(ComputeNode):
+        init_input_ports = [Port("a")]
+        init_output_ports = [Port("res", type=str)]
+
+        @staticmethod
+        def func(a):
+            return str(a)
+
+    with Flow() as flow:
+        add1: ComputeNode = Add(name="add1", job_type="local")
+        add2: ComputeNode = Add(name="add2", job_type="local")
+        sq1: ComputeNode = Square(name="sq1", job_type="local")
+        add1.connect_with(add2, 0, 0)
+        add2.connect_with(add1, 0, 0)
+        add2.connect_with(sq1, 0, 0)
+    with pytest.raises(FlowValidationError) as e:
+        flow.validate()
+    assert any("Cycle" in p for p in e.value.problems)
+    with pytest.raises(FlowValidationError):
+        await flow({"add1.b": 1, "add2.b": 1}, validate=True)
+
+    with Flow() as flow:
+        s1 = StrNode(name="s1", job_type="local")
+        add1 = Add(name="add1", job_type="local")
+        s1.connect_with(add1, 0, 0)
+    with pytest.raises(FlowValidationError) as e:
+        flow.validate()
+    assert any("Type mismatch" in p for p in e.value.problems)
+
+    with Flow() as flow:
+        sq1 = Square(name="sq1", job_type="local")
+        sq2 = Square(name="sq2", job_type="local")
+        sq3 = Square(name="sq3", job_type="local")
+        sq1.connect_with(sq2, 0, 0)
+        sq1.connect_with(sq3, 0, 0)
+    assert flow.validate() == []
+    dead = flow.validate(outputs=["sq2.res"], prune=True)
+    assert dead == [sq3]
+    assert sq3.id not in flow.nodes
+    res = await flow({"sq1.a": 2}, validate=True)
+    assert res == {"sq2.res": 16}
+
+
+@pytest.mark.asyncio
+async def test_bulk_construction(node_defs):
+    Add = node_defs['add']
+    flow = Flow()
+    adds = flow.add_nodes(Add, 3, job_type="local")
+    assert len(flow.nodes) == 3
+    assert all(n.flow is flow for n in adds)
+    edges = [[0, 0, 1, 0], [1, 0, 2, 0]]
+    try:
+        import numpy as np
+        edges = np.array(edges)
+    except ImportError:
+        pass
+    conns = flow.connect_many(edges)
+    assert len(conns) == 2
+    assert len(flow.connections) == 2
+    assert adds[2].input_ports[0].predecessors == {adds[1].output_ports[0]}
+    res = await flow({
+        f"{adds[0].name}.a": 1, f"{adds[0].name}.b": 1,
+        f"{adds[1].name}.b": 1, f"{adds[2].name}.b": 1})
+    assert res == {f"{adds[2].name}.res": 4}
+    other = Flow()
+    with pytest.raises(ValueError):
+        other.connect_many([[0, 0, 1, 0]], nodes=adds)
+    with pytest.raises(ValueError):
+        flow.connect_many([[0, 0, -1, 0]])
+    assert len(flow.connections) == 2
+
+
+def test_gc_paused():
+    import gc
+    from sunmao.core.utils import gc_paused
+    thresholds = gc.get_threshold()
+    with gc_paused():
+        with gc_paused():
+            assert gc.isenabled()
+            assert gc.get_threshold()[0] > thresholds[0]
+        assert gc.get_threshold()[0] > thresholds[0]
+    assert gc.get_threshold() == thresholds
+
+
+def test_node_indexes(node_defs):
+    Add = node_defs['add']
+    Square = node_defs['square']
+    with Flow() as flow:
+        add1: ComputeNode = Add(name="add1")
+        sq1: ComputeNode = Square(name="sq1")
+        sq2: ComputeNode = Square(name="sq2")
+    assert add1.get_port("b") is add1.input_ports[1]
+    assert add1.get_port("res") is add1.output_ports[0]
+    with pytest.raises(KeyError):
+        add1.get_port("x")
+    assert flow.get_node("sq1") is sq1
+    assert set(flow.nodes_of_type(Square)) == {sq1, sq2}
+    assert flow.nodes_of_type(ComputeNode, subclass=False) == []
+    assert len(flow.nodes_of_type(ComputeNode)) == 3
+    sq2.name = "sq1.x"
+    assert flow.get_node("sq1.x") is sq2
+    assert flow.get_output_port("sq1.x.res") is sq2.output_ports[0]
+    sq2.name = "sq1"
+    with pytest.raises(ValueError):
+        flow.get_node("sq1")
+    flow.remove_obj(sq2)
+    assert flow.get_node("sq1") is sq1
+    assert flow.nodes_of_type(Square) == [sq1]
+    with pytest.raises(KeyError):
+        flow.get_node("sq2")
+
+
+@pytest.mark.asyncio
+async def test_flow_stream(node_defs):
+    Square = node_defs['square']
+    SleepSquare = node_defs['sleep_square']
+    with Flow() as flow:
+        sq1: ComputeNode = Square(name="sq1", job_type="thread")
+        sq2: ComputeNode = SleepSquare(name="sq2", job_type="thread")
+    events = []
+    t0 = time.time()
+    async for key, value in flow.stream({"sq1.a": 2, "sq2.a": 3}):
+        events.append((key, value, time.time() - t0))
+    assert [e[:2] for e in events] == [("sq1.res", 4), ("sq2.res", 9)]
+    # the fast branch is not blocked by the slow one
+    assert events[0][2] < 0.4
+    assert len(sq1.output_ports[0].callbacks) == 0
+    stream = flow.stream({"sq1.a": 2, "sq2.a": 3})
+    assert (await stream.__anext__()) == ("sq1.res", 4)
+    await stream.aclose()  # stop early, cancel the flow
+    assert not flow.is_running
+
+
+@pytest.mark.asyncio
+async def test_record_and_replay(tmp_path, node_defs):
+    from sunmao.core.record import SignalReplayer, read_record
+    Add = node_defs['add']
+
+    class SlowSquare(ComputeNode):
+        init_input_ports = [Port("a")]
+        init_output_ports = [Port("res")]
+
+        @staticmethod
+        def func(a):
+            time.sleep(0.1)
+            return [a] * 100
+
+    with Flow() as flow:
+        add: ComputeNode = Add(name="add", job_type="local")
+        sq: ComputeNode = SlowSquare(name="sq", job_type="thread")
+        add.connect_with(sq, 0, 0)
+    path = tmp_path / "signals.jsonl"
+    with flow.record(path, payloads=True):
+        await flow({"add.a": 1, "add.b": 2})
+    assert flow.recorder is None
+    header, events = read_record(path)
+    assert [n["name"] for n in header["nodes"]] == ["add", "sq"]
+    assert [e[1] for e in events if e[1] == "i"] == ["i", "i"]
+    assert [e[1] for e in events if e[2] == 1] == ["r", "d", "o"]
+
+    replayer = SignalReplayer(path)
+    assert replayer.nodes[1].runs[0][0] >= 0.1
+    res = []
+    replayer.nodes[1].output_ports[0].register_callback(res.append)
+    elapsed = await replayer.run()
+    assert elapsed >= 0.1
+    out_size = [e[4] for e in events if e[1] == "o" and e[2] == 1][0]
+    assert res == [bytes(out_size)]
+
+    # the run time is measured in the job, not include the queueing
+    from executor.engine import EngineSetting
+    with Session(EngineSetting(max_thread_jobs=1)):
+        with Flow() as flow:
+            sq = SlowSquare(name="sq", job_type="thread", exec_mode="any")
+        with flow.record(path):
+            await flow.pipeline([{"sq.a": i} for i in range(3)])
+    replayer = SignalReplayer(path)
+    durations = [d for d, _ in replayer.nodes[0].runs]
+    assert len(durations) == 3
+    assert all(0.1 <= d < 0.18 for d in durations)
+
+
+@pytest.mark.asyncio
+async def test_array_port():
+    np = pytest.importorskip("numpy")
+    from sunmao.core.array_port import ArrayPort
+
+    class Scale(ComputeNode):
+        init_input_ports = [ArrayPort("x", dtype="float64", shape=(None, 3))]
+        init_output_ports = [ArrayPort("y", dtype="float64")]
+
+        @staticmethod
+        def func(x):
+            return x * 2
+
+    seen = []
+
+    class Keep(ComputeNode):
+        init_input_ports = [ArrayPort("x")]
+        init_output_ports = [ArrayPort("y")]
+
+        @staticmethod
+        def func(x):
+            seen.append(x)
+            return x
+
+    class Pick(ComputeNode):
+        init_input_ports = [ArrayPort("x", columns=["a"])]
+        init_output_ports = [Port("n")]
+
+        @staticmethod
+        def func(x):
+            return list(x.dtype.names)
+
+    with Flow() as flow:
+        scale = Scale(name="scale", job_type="local")
+        k1 = Keep(name="k1", job_type="local")
+        k2 = Keep(name="k2", job_type="local")
+        scale.connect_with(k1, 0, 0)
+        scale.connect_with(k2, 0, 0)
+    res = await flow({"scale.x": np.ones((4, 3))})
+    assert (res["k1.y"] == 2).all()
+    # fan-out successors share the same read-only buffer
+    assert len(seen) == 2
+    assert np.shares_memory(seen[0], seen[1])
+    assert not seen[0].flags.writeable
+    with pytest.raises(ValueError):
+        await scale(np.ones((4, 2)))
+    with pytest.raises(TypeError):
+        await scale(np.ones((4, 3), dtype="int32"))
+    with pytest.raises(TypeError):
+        await scale([[1.0, 1.0, 1.0]])
+
+    with Flow() as flow2:
+        pick = Pick(name="pick", job_type="local")
+    arr = np.zeros(3, dtype=[("a", "f8"), ("b", "i4")])
+    res = await flow2({"pick.x": arr})
+    assert res == {"pick.n": ["a"]}
+
+
+@pytest.mark.asyncio
+async def test_placement(node_defs):
+    distributed = pytest.importorskip("distributed")
+    from sunmao.core.placement import plan_placement, cut_weight
+    Square = node_defs['square']
+
+    cluster = await distributed.LocalCluster(
+        n_workers=2, processes=False, asynchronous=True,
+        dashboard_address=None)
+    client = await distributed.Client(cluster, asynchronous=True)
+    try:
+        with Session() as sess:
+            sess.engine.dask_client = client
+            with Flow() as flow:
+                chains = []
+                for _ in range(2):
+                    nodes = [Square(job_type="process") for _ in range(2)]
+                    nodes.append(Square(job_type="thread"))
+                    for n1, n2 in zip(nodes, nodes[1:]):
+                        n1.connect_with(n2, 0, 0)
+                    chains.append(nodes)
+            placement = plan_placement(flow, 2)
+            assert cut_weight(flow, placement) == 0
+            for nodes in chains:
+                assert len({placement[n] for n in nodes}) == 1
+            workers = [w.address for w in cluster.workers.values()]
+            pinned = flow.place(workers)
+            assert set(pinned.values()) == set(workers)
+            # only the process nodes are pinned
+            assert set(pinned) == {n for c in chains for n in c[:2]}
+            for nodes in chains:
+                assert nodes[0].job_type == "dask"
+                assert nodes[-1].job_type == "thread"
+                assert nodes[-1].worker is None
+                assert not nodes[-1].remote_data
+            assert chains[0][0].worker != chains[1][0].worker
+            res = await flow({
+                f"{chains[0][0].name}.a": 2,
+                f"{chains[1][0].name}.a": 3,
+            })
+            assert res == {
+                f"{chains[0][-1].name}.res": 256,
+                f"{chains[1][-1].name}.res": 6561,
+            }
+            ref = chains[0][1].output_ports[0].cache
+            who_has = await client.who_has([ref.future])
+            assert list(who_has.values())[0] == [chains[0][1].worker]
+            assert chains[0][1].get_init_kwargs()["worker"] == \
+                chains[0][1].worker
+    finally:
+        await client.close()
+        await cluster.close()
+
+
+@pytest.mark.asyncio
+async def test_auto_job_type(tmp_path, monkeypatch):
+    from sunmao.core.profile import JobProfiler, ClassProfile, class_key
+
+    class Tiny(ComputeNode):
+        init_input_ports = [Port("a")]
+        init_output_ports = [Port("res")]
+
+        @staticmethod
+        def func(a):
+            return a + 1
+
+    class Busy(Tiny):
+        @staticmethod
+        def func(a):
+            t0 = time.thread_time()
+            while time.thread_time() - t0 < 0.03:
+                pass
+            return a
+
+    class Sleepy(Tiny):
+        @staticmethod
+        def func(a):
+            time.sleep(0.03)
+            return a
+
+    class Hasher(Tiny):
+        # cpu bound but release the GIL
+        @staticmethod
+        def func(a):
+            data = b"x" * 2 ** 20
+            t0 = time.thread_time()
+            while time.thread_time() - t0 < 0.03:
+                hashlib.sha256(data)
+            return a
+
+    path = tmp_path / "profile.json"
+    with Session() as sess:
+        sess.job_profiler = JobProfiler(path, n_samples=2)
+        with Flow() as flow:
+            nodes = [
+                cls(job_type="auto") for cls in (Tiny, Busy, Sleepy, Hasher)]
+        for node in nodes:
+            for i in range(2):
+                await node(i)
+                await flow.join()
+        expect = {
+            Tiny: "local", Busy: "process",
+            Sleepy: "thread", Hasher: "thread"}
+        for cls, job_type in expect.items():
+            assert sess.job_profiler.job_type_of(class_key(cls)) == job_type
+        res = await flow({f"{n.name}.a": 5 for n in nodes})
+        assert res[f"{nodes[0].name}.res"] == 6
+        job = sess.engine.jobs.get_job_by_id(nodes[1].jobs_id[-1])
+        assert type(job).__name__ == "ProcessJob"
+    # later sessions load the learned profile
+    profiler = JobProfiler(path)
+    assert profiler.job_type_of(class_key(Busy)) == "process"
+    profiler.reset(Busy)
+    assert profiler.job_type_of(class_key(Busy)) is None
+    assert JobProfiler(path).job_type_of(class_key(Busy)) is None
+    monkeypatch.delenv("SUNMAO_JOB_PROFILE", raising=False)
+    assert JobProfiler().path is None
+
+    main_pid = os.getpid()
+
+    class MainOnly(Tiny):
+        @staticmethod
+        def func(a):
+            if os.getpid() != main_pid:
+                raise RuntimeError("not in the main process")
+            return a
+
+    with Session() as sess:
+        sess.job_profiler = JobProfiler(n_samples=2)
+        key = class_key(MainOnly)
+        sess.job_profiler.profiles[key] = ClassProfile(job_type="process")
+        with Flow() as flow:
+            node = MainOnly(job_type="auto", retries=1)
+        # fall back to profiling when the learned job type failed
+        assert await flow({f"{node.name}.a": 1}) == {f"{node.name}.res": 1}
+        assert sess.job_profiler.job_type_of(key) is None
+
+
+@pytest.mark.asyncio
+async def test_pipeline_tags():
+    class Slow0(ComputeNode):
+        init_input_ports = [Port("a")]
+        init_output_ports = [Port("res")]
+
+        @staticmethod
+        def func(a):
+            time.sleep(0.2 if a == 0 else 0.0)
+            return a
+
+    class Slow12(Slow0):
+        @staticmethod
+        def func(a):
+            time.sleep(0.0 if a == 0 else 0.2 * a)
+            return a * 10
+
+    class Pair(ComputeNode):
+        init_input_ports = [Port("x"), Port("y")]
+        init_output_ports = [Port("res")]
+
+        @staticmethod
+        def func(x, y):
+            return [x, y]
+
+    with Session():
+        with Flow() as flow:
+            p = Slow0(name="p")
+            q = Slow12(name="q")
+            pair = Pair(name="pair")
+            p.connect_with(pair, 0, 0)
+            q.connect_with(pair, 0, 1)
+        inputs = [{"p.a": i, "q.a": i} for i in range(3)]
+        res = await flow.pipeline(inputs)
+        assert res == [{"pair.res": [i, i * 10]} for i in range(3)]
+        # untagged signals keep the old behavior
+        res = await flow({"p.a": 1, "q.a": 1})
+        assert res == {"pair.res": [1, 10]}
+        pair.input_ports[0].put_signal(data=1)
+        pair.input_ports[1].put_signal(data=2)
+        await pair.activate()
+        await flow.join()
+        assert pair.output_ports[0].cache == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_merged_signals(node_defs, tmp_path):
+    Square = node_defs['square']
+    with Flow() as flow:
+        deb: ComputeNode = Square(name="deb", job_type="local", debounce=0.05)
+        rec: ComputeNode = Square(
+            name="rec", job_type="thread", exec_mode="any", coalesce=True)
+        deb.connect_with(rec, 0, 0)
+    # the merged signals of different runs are not dropped
+    res = await flow.pipeline([{"deb.a": i} for i in range(4)])
+    assert res == [{"rec.res": i ** 4} for i in range(4)]
+
+    inp = deb.input_ports[0]
+    inp.put_signal(data=1, tag=3)
+    inp.put_signal(data=2, tag=3)
+    inp.put_signal(data=3)
+    deb._merge_signals()
+    assert [(s.tag, s.data) for s in inp.signal_buffer] == \
+        [(3, 2), (None, 3)]
+    flow.save_checkpoint(tmp_path)
+    inp.clear_signal_buffer()
+    from sunmao.core.serialize import get_class_path
+    flow2 = Flow.load_checkpoint(
+        tmp_path, node_classes={get_class_path(Square): Square})
+    inp2 = flow2.get_node("deb").input_ports[0]
+    assert [(s.tag, s.data) for s in inp2.signal_buffer] == \
+        [(3, 2), (None, 3)]